@@ -0,0 +1,219 @@
+# benchmarks/fake_openai.py
+"""
+A local stand-in for the OpenAI chat completions endpoint, for benchmarking
+obs without calling the real API.
+
+Responses are shaped so that obs commands succeed: a request for a rewritten
+document or section gets it back with one extra bullet, and a request for
+appended content gets `completion_tokens` tokens of filler. Each response
+waits `latency_ms` before the first token, then emits tokens at
+`tokens_per_second` (0 for no limit), streamed as server-sent events when the
+client asks for a stream. Like the real API, a response is cut off at
+`max_output_tokens` (gpt-4o's limit by default), with finish_reason "length".
+
+Run it on its own with:
+
+    python benchmarks/fake_openai.py --port 8765 --latency-ms 300
+
+and point obs at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Characters per fake token, matching obs.chunks.CHARS_PER_TOKEN
+CHARS_PER_TOKEN = 4
+FILLER = "The quick brown fox jumps over the lazy dog. "
+# gpt-4o's limit on the tokens of one response
+MAX_OUTPUT_TOKENS = 16_384
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency_ms: float = 100,
+        tokens_per_second: float = 0,
+        completion_tokens: int = 100,
+        max_output_tokens: int = MAX_OUTPUT_TOKENS,
+    ):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.max_output_tokens = max_output_tokens
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+def start_server(**options) -> FakeOpenAIServer:
+    """Start a server on a free local port in a background thread."""
+    server = FakeOpenAIServer(("127.0.0.1", 0), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_completion(messages: list[dict], completion_tokens: int, edits: bool) -> str:
+    """
+    Work out a plausible response to an obs request from its messages.
+    """
+    system = messages[0]["content"]
+    document = messages[-2]["content"]
+    if edits:
+        headings = [line for line in document.splitlines() if line.startswith("#")]
+        edit = {
+            "op": "append_to_section",
+            "heading": headings[-1] if headings else "",
+            "content": "- Added by the fake server",
+        }
+        return json.dumps({"edits": [edit]})
+    if "Section content:\n\n" in document:
+        document = document.split("Section content:\n\n", 1)[1]
+    elif "instructions on appending content" in system:
+        filler = FILLER * (completion_tokens * CHARS_PER_TOKEN // len(FILLER) + 1)
+        return filler[: completion_tokens * CHARS_PER_TOKEN]
+    return document.rstrip("\n") + "\n- Added by the fake server\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.count_request()
+
+        content = fake_completion(
+            request["messages"],
+            self.server.completion_tokens,
+            edits=request.get("response_format", {}).get("type") == "json_object",
+        )
+        finish_reason = "stop"
+        if len(content) > self.server.max_output_tokens * CHARS_PER_TOKEN:
+            content = content[: self.server.max_output_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+        prompt_chars = sum(len(m["content"]) for m in request["messages"])
+        usage = {
+            "prompt_tokens": prompt_chars // CHARS_PER_TOKEN,
+            "completion_tokens": len(content) // CHARS_PER_TOKEN,
+            "total_tokens": (prompt_chars + len(content)) // CHARS_PER_TOKEN,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        time.sleep(self.server.latency_ms / 1000)
+
+        if request.get("stream"):
+            self._stream(request, content, usage, finish_reason)
+        else:
+            self._wait_for_tokens(len(content) // CHARS_PER_TOKEN)
+            self._send_json(
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": finish_reason,
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+    def _stream(self, request: dict, content: str, usage: dict, finish_reason: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def event(choices: list, usage: dict | None = None):
+            data = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": choices,
+            }
+            if usage is not None:
+                data["usage"] = usage
+            self._send_chunk(f"data: {json.dumps(data)}\n\n")
+
+        # Send a few tokens per event, as the real API roughly does
+        step = 4 * CHARS_PER_TOKEN
+        for start in range(0, len(content), step):
+            self._wait_for_tokens(4)
+            delta = {"content": content[start : start + step]}
+            event([{"index": 0, "delta": delta, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        if request.get("stream_options", {}).get("include_usage"):
+            event([], usage)
+        self._send_chunk("data: [DONE]\n\n")
+        self._send_chunk("")
+
+    def _wait_for_tokens(self, tokens: int):
+        if self.server.tokens_per_second > 0:
+            time.sleep(tokens / self.server.tokens_per_second)
+
+    def _send_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--completion-tokens", type=int, default=100)
+    parser.add_argument("--max-output-tokens", type=int, default=MAX_OUTPUT_TOKENS)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        ("127.0.0.1", args.port),
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        max_output_tokens=args.max_output_tokens,
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# benchmarks/run.py
+"""
+Benchmark obs end to end against a local fake OpenAI API (see fake_openai.py),
+and print the results as JSON so they can be compared between versions:
+
+    python benchmarks/run.py --runs 5 --latency-ms 300 --output before.json
+
+Measures:
+  - cold start of `obs create` in fresh interpreters (obs --bench-startup)
+  - end-to-end latency of create, append, insert and CRM insert (both via the
+    API and via the deterministic fast path) for a range of note sizes
+  - throughput of `obs batch` running many append jobs at several
+    concurrency levels
+
+Every command runs in a fresh interpreter against a throwaway vault, config
+and cache directory, with the response cache disabled.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from fake_openai import start_server
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from obs.bench import bench_startup  # noqa: E402
+from obs.commands.cmd_create_person import PERSON_TEMPLATE  # noqa: E402
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 * 1024}
+# Content longer than this can't be passed to `create` as a single argument
+MAX_ARGUMENT_BYTES = 100 * 1024
+
+# (name, vault, action, instruction); notes are restored before every run
+COMMANDS = [
+    ("append", "B", "append", "Summarise the note in a few bullet points"),
+    ("insert", "B", "insert", "Add a follow-up item to section 003"),
+    ("crm_insert", "C", "insert", "She has started learning the cello"),
+    ("crm_insert_fast", "C", "insert", "email is bench@example.com"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark obs end to end.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sizes", default="1KB,10KB,100KB,1MB,5MB")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--completion-tokens", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    server = start_server(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+    pythonpath = os.environ.get("PYTHONPATH")
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(REPO_DIR), pythonpath])
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _environment(Path(tmp), server.base_url)
+        _log("Measuring cold start...")
+        # bench_startup prints a summary, which would corrupt the JSON output
+        with contextlib.redirect_stdout(sys.stderr):
+            startup = bench_startup(max(args.runs, 5))
+
+        latency = []
+        for size_name in args.sizes.split(","):
+            size = _parse_size(size_name)
+            _log(f"Measuring commands on {size_name} notes...")
+            latency.append(_bench_create(env, size_name, size, args.runs))
+            for name, vault_code, action, instruction in COMMANDS:
+                latency.append(
+                    _bench_command(
+                        env,
+                        name,
+                        vault_code,
+                        action,
+                        instruction,
+                        size_name,
+                        size,
+                        args.runs,
+                    )
+                )
+
+        throughput = []
+        for concurrency in args.concurrency.split(","):
+            _log(f"Measuring batch throughput at concurrency {concurrency}...")
+            throughput.append(_bench_batch(env, args.jobs, int(concurrency)))
+
+    results = {
+        "version": _git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "startup": startup,
+        "latency": latency,
+        "throughput": throughput,
+        "api_requests": server.requests,
+    }
+    server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        _log(f"Wrote results to {args.output}")
+    else:
+        print(output)
+
+
+def _environment(tmp: Path, base_url: str) -> dict:
+    """
+    Create a throwaway config with a plain vault (B) and a CRM vault (C), and
+    return the environment to run obs against it and the fake API.
+    """
+    for name in ("vault_b", "vault_c", "backups", "cache"):
+        (tmp / name).mkdir()
+    config_path = tmp / "obs_config.yaml"
+    config_path.write_text(
+        f"vaults:\n  B: {tmp / 'vault_b'}\n  C: {tmp / 'vault_c'}\n"
+        f"backup_dir: {tmp / 'backups'}\n"
+        'openai_api_key: "sk-bench"\n'
+        "response_cache: false\n",
+        encoding="utf-8",
+    )
+    return dict(
+        os.environ,
+        OBS_CONFIG=str(config_path),
+        XDG_CACHE_HOME=str(tmp / "cache"),
+        OPENAI_BASE_URL=base_url,
+        OBS_NO_DAEMON="1",
+        BENCH_TMP=str(tmp),
+    )
+
+
+def _bench_create(env: dict, size_name: str, size: int, runs: int) -> dict:
+    result = {"command": "create", "size": size_name, "size_bytes": size}
+    if size > MAX_ARGUMENT_BYTES:
+        result["skipped"] = "content too large to pass as an argument"
+        return result
+
+    content = _plain_note(size)
+    note_path = Path(env["BENCH_TMP"]) / "vault_b" / "Created.md"
+    timings, errors = [], []
+    for _ in range(runs):
+        note_path.unlink(missing_ok=True)
+        _run(["B", "create", "Created", content], env, timings, errors)
+    return result | _summarise(timings, errors)
+
+
+def _bench_command(
+    env: dict,
+    name: str,
+    vault_code: str,
+    action: str,
+    instruction: str,
+    size_name: str,
+    size: int,
+    runs: int,
+) -> dict:
+    if vault_code == "C":
+        note = _crm_note(size)
+        note_path = Path(env["BENCH_TMP"]) / "vault_c" / "Jane Doe.md"
+    else:
+        note = _plain_note(size)
+        note_path = Path(env["BENCH_TMP"]) / "vault_b" / "Note.md"
+
+    timings, errors = [], []
+    for _ in range(runs):
+        note_path.write_text(note, encoding="utf-8")
+        _run([vault_code, action, note_path.stem, instruction], env, timings, errors)
+    result = {"command": name, "size": size_name, "size_bytes": size}
+    return result | _summarise(timings, errors)
+
+
+def _bench_batch(env: dict, jobs: int, concurrency: int) -> dict:
+    """
+    Run `jobs` append jobs spread over eight notes through `obs batch`.
+    """
+    tmp = Path(env["BENCH_TMP"])
+    notes = [f"Batch{i}" for i in range(8)]
+    for name in notes:
+        (tmp / "vault_b" / f"{name}.md").write_text(
+            _plain_note(10 * 1024), encoding="utf-8"
+        )
+    jobs_path = tmp / "jobs.jsonl"
+    with open(jobs_path, "w", encoding="utf-8") as f:
+        for i in range(jobs):
+            job = {
+                "vault": "B",
+                "action": "append",
+                "filename": notes[i % len(notes)],
+                "instruction": "Add a short summary",
+            }
+            f.write(json.dumps(job) + "\n")
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [
+            *(sys.executable, "-m", "obs.cli", "batch"),
+            *("--concurrency", str(concurrency), str(jobs_path)),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    statuses = [json.loads(line)["status"] for line in completed.stdout.splitlines()]
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(jobs / elapsed, 2),
+        "failed": len(statuses) - statuses.count("ok"),
+    }
+
+
+def _run(args: list[str], env: dict, timings: list, errors: list) -> None:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "obs.cli", *args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if completed.returncode == 0:
+        timings.append(elapsed)
+    else:
+        output = (completed.stdout + completed.stderr).strip().splitlines()
+        errors.append(output[-1] if output else f"exit code {completed.returncode}")
+
+
+def _summarise(timings: list[float], errors: list[str]) -> dict:
+    summary = {"runs": len(timings)}
+    if timings:
+        summary |= {
+            "median_ms": round(statistics.median(timings), 2),
+            "min_ms": round(min(timings), 2),
+            "max_ms": round(max(timings), 2),
+        }
+    if errors:
+        summary["errors"] = sorted(set(errors))
+    return summary
+
+
+def _plain_note(size: int) -> str:
+    """
+    A note of about `size` bytes, made of `## Section NNN` headings with ten
+    bullets each.
+    """
+    parts = ["# Benchmark note\n\n"]
+    length = len(parts[0])
+    section = 0
+    while length < size:
+        bullets = "".join(
+            f"- Item {section}.{i}: notes on the work done for this item so far\n"
+            for i in range(10)
+        )
+        part = f"## Section {section:03d}\n\n{bullets}\n"
+        parts.append(part)
+        length += len(part)
+        section += 1
+    return "".join(parts)[: max(size, 1)]
+
+
+def _crm_note(size: int) -> str:
+    """
+    A CRM contact of about `size` bytes, padded out with dated conversations.
+    """
+    contact = PERSON_TEMPLATE.format(name="Jane Doe")
+    heading = "## Conversations and Events\n"
+    events = []
+    length = len(contact)
+    day = date(2024, 12, 31)
+    while length < size:
+        event = (
+            f"\n### [[{day.isoformat()}]]\n\n"
+            "- Caught up over coffee and talked about work and travel plans\n"
+            "- Discussed a book she was reading\n"
+        )
+        events.append(event)
+        length += len(event)
+        day -= timedelta(days=1)
+    return contact.replace(heading, heading + "".join(events), 1)
+
+
+def _parse_size(size: str) -> int:
+    size = size.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[: -len(unit)]) * factor)
+    return int(size)
+
+
+def _git_version() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,52 @@
 # obs/backup.py
+import gzip
+import hashlib
+import json
+import os
+import shutil
 import sys
-from datetime import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextvars import copy_context
+from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import quote
+
+from obs.trace import span
+
+# ioctl request to clone a file's extents (Linux, on btrfs/XFS and similar)
+FICLONE = 0x40049409
+
+# Blobs are stored before the manifest line that refers to them is written, so
+# pruning leaves alone blobs stored (or reused) more recently than this
+BLOB_GRACE_SECONDS = 60 * 60
+
+# Backups are stored per vault as content-addressed, gzip-compressed blobs,
+# plus one manifest per note listing its versions, oldest first,
+#
+#     backup_dir / P / objects / 3f / 3f2a...e1.gz
+#     backup_dir / P / manifests / MyNote.jsonl
+#
+# with manifest lines like:
+#
+#     {"time": "2025-01-22T15:22:07", "hash": "3f2a...e1", "size": 1234}
 
 
 def backup_note(
-    vault_code: str, vault_path: Path, filename: str, backup_dir: Path
+    vault_code: str,
+    vault_path: Path,
+    filename: str,
+    backup_dir: Path,
+    retention: dict | None = None,
 ) -> None:
     """
-    Creates a timestamped backup of the note before editing.
+    Records the current content of the note as a new version before editing.
 
-    Example of final backup path:
-        backup_dir / P / 2025-01-22-T15-22-MyNote.md
+    Content that is already in the store is not written again, and no new
+    version is recorded if the note is unchanged since its last backup.
+    `retention` (see apply_retention) is applied to the note's versions.
 
     If the original file doesn't exist, we won't create a backup.
     """
@@ -20,25 +55,315 @@ def backup_note(
         print(f"Warning: Cannot back up non-existing file '{file_path}'.")
         return
 
-    # Read existing file content
+    with span("backup"):
+        # Read existing file content
+        try:
+            content = file_path.read_bytes()
+        except Exception as e:
+            print(f"Error reading file for backup: {e}")
+            return
+
+        message = _record_version(vault_code, filename, backup_dir, content, retention)
+    print(message)
+
+
+def start_backup(
+    vault_code: str,
+    vault_path: Path,
+    filename: str,
+    backup_dir: Path,
+    retention: dict | None = None,
+) -> Future | None:
+    """
+    Back up the note without holding up the edit: snapshot it with the
+    cheapest mechanism available (see _snapshot), then compress and record the
+    snapshot in a background thread while the edit goes ahead.
+
+    Commands must replace notes atomically rather than writing them in place,
+    as a hardlink snapshot shares its data with the original file.
+
+    Pass the returned future to finish_backup once the edit is done. Returns
+    None if there is nothing to back up.
+    """
+    file_path = vault_path / f"{filename}.md"
+    if not file_path.exists():
+        print(f"Warning: Cannot back up non-existing file '{file_path}'.")
+        return None
+
+    staging_dir = backup_dir / vault_code / "staging"
     try:
-        content = file_path.read_text(encoding="utf-8")
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        snapshot_path = staging_dir / f"{uuid.uuid4().hex}.md"
+        with span("backup.snapshot"):
+            _snapshot(file_path, snapshot_path)
     except Exception as e:
-        print(f"Error reading file for backup: {e}")
+        print(f"Error snapshotting file for backup: {e}")
+        return None
+
+    future = Future()
+
+    def record():
+        try:
+            with span("backup.record"):
+                content = snapshot_path.read_bytes()
+                message = _record_version(
+                    vault_code, filename, backup_dir, content, retention
+                )
+            future.set_result(message)
+        except Exception as e:
+            future.set_result(f"Error reading snapshot for backup: {e}")
+        finally:
+            snapshot_path.unlink(missing_ok=True)
+
+    # Not a daemon thread, so the backup completes even if the edit exits early.
+    # It runs in a copy of this context so its span joins the command's trace.
+    threading.Thread(
+        target=copy_context().run, args=(record,), name=f"backup-{filename}"
+    ).start()
+    return future
+
+
+def finish_backup(future: Future | None) -> None:
+    """
+    Wait for a backup started by start_backup to be recorded and report it.
+    """
+    if future is not None:
+        with span("backup.wait"):
+            message = future.result()
+        print(message)
+
+
+def _snapshot(source: Path, destination: Path) -> None:
+    """
+    Make destination a snapshot of source, trying in order: a copy-on-write
+    reflink, a hardlink (which stays valid because notes are only ever
+    replaced, never rewritten in place), an in-kernel copy_file_range, and
+    finally shutil.copyfile.
+    """
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            destination.unlink(missing_ok=True)
+
+    try:
+        os.link(source, destination)
         return
+    except OSError:
+        pass
 
-    # Ensure subdirectory for vault code exists
-    vault_backup_dir = backup_dir / vault_code
-    vault_backup_dir.mkdir(parents=True, exist_ok=True)
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+
+    shutil.copyfile(source, destination)
 
-    # Create a timestamped backup filename
-    timestamp = datetime.now().strftime("%Y-%m-%d-T%H-%M")
-    backup_filename = f"{timestamp}-{filename}.md"
-    backup_path = vault_backup_dir / backup_filename
 
-    # Write content to the backup file
+def _record_version(
+    vault_code: str,
+    filename: str,
+    backup_dir: Path,
+    content: bytes,
+    retention: dict | None,
+) -> str:
+    """
+    Store content as the note's newest version and apply the retention policy.
+    Returns a message describing what was done.
+    """
     try:
-        backup_path.write_text(content, encoding="utf-8")
-        print(f"Backed up '{filename}.md' to '{backup_path}'")
+        content_hash = _store_blob(backup_dir / vault_code, content)
+        versions = note_history(vault_code, filename, backup_dir)
+        if versions and versions[-1]["hash"] == content_hash:
+            message = f"'{filename}.md' is unchanged since its last backup."
+        else:
+            entry = {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "hash": content_hash,
+                "size": len(content),
+            }
+            manifest_path = _manifest_path(vault_code, filename, backup_dir)
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            versions.append(entry)
+            message = f"Backed up '{filename}.md' as version {content_hash[:10]}"
+
+        if retention:
+            kept = apply_retention(versions, retention)
+            if len(kept) < len(versions):
+                _atomic_write_lines(
+                    _manifest_path(vault_code, filename, backup_dir), kept
+                )
+        return message
     except Exception as e:
-        print(f"Error writing backup file '{backup_path}': {e}")
+        return f"Error writing backup of '{filename}.md': {e}"
+
+
+def note_history(vault_code: str, filename: str, backup_dir: Path) -> list[dict]:
+    """
+    Return the recorded versions of a note, oldest first.
+    """
+    manifest_path = _manifest_path(vault_code, filename, backup_dir)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def show_history(vault_code: str, filename: str, backup_dir: Path) -> None:
+    """
+    Print the recorded versions of a note, most recent first, numbered as
+    expected by restore_note.
+    """
+    versions = note_history(vault_code, filename, backup_dir)
+    if not versions:
+        print(f"No backups found for '{filename}.md'.")
+        return
+    for number, version in enumerate(reversed(versions), start=1):
+        print(
+            f"{number:>4}  {version['time']}  {version['hash'][:10]}  "
+            f"{version['size']} bytes"
+        )
+
+
+def restore_note(
+    vault_code: str, vault_path: Path, filename: str, backup_dir: Path, number: int
+) -> None:
+    """
+    Restore a note to a recorded version, numbered from 1 for the most recent
+    as printed by show_history. The current content is backed up first, so a
+    restore can itself be undone.
+    """
+    from obs.fileio import atomic_writer
+
+    versions = note_history(vault_code, filename, backup_dir)
+    if not 1 <= number <= len(versions):
+        print(f"Error: '{filename}.md' has no backup version {number}.")
+        sys.exit(1)
+    version = versions[-number]
+
+    blob_path = _blob_path(backup_dir / vault_code, version["hash"])
+    try:
+        content = gzip.decompress(blob_path.read_bytes()).decode("utf-8")
+    except Exception as e:
+        print(f"Error reading backup version {number} of '{filename}.md': {e}")
+        sys.exit(1)
+
+    backup_note(vault_code, vault_path, filename, backup_dir)
+    file_path = vault_path / f"{filename}.md"
+    try:
+        with atomic_writer(file_path) as f:
+            f.write(content)
+        print(f"Restored '{file_path}' to the version from {version['time']}")
+    except Exception as e:
+        print(f"Error writing file '{file_path}': {e}")
+        sys.exit(1)
+
+
+def apply_retention(versions: list[dict], retention: dict) -> list[dict]:
+    """
+    Return the versions to keep under a retention policy, which may set:
+      keep_last: keep at most this many of the most recent versions
+      max_age_days: drop versions older than this many days
+    The most recent version is always kept.
+    """
+    kept = versions
+    if retention.get("max_age_days") is not None:
+        cutoff = datetime.now() - timedelta(days=retention["max_age_days"])
+        kept = [v for v in kept if datetime.fromisoformat(v["time"]) >= cutoff]
+    if retention.get("keep_last") is not None:
+        kept = kept[-max(retention["keep_last"], 1) :]
+    if versions and not kept:
+        kept = versions[-1:]
+    return kept
+
+
+def prune_backups(vault_code: str, backup_dir: Path, retention: dict | None) -> None:
+    """
+    Apply the retention policy to every note in the vault's backups, then
+    delete blobs no longer referenced by any version. Blobs stored within the
+    last BLOB_GRACE_SECONDS are kept, as a backup may be about to record them.
+    """
+    vault_backup_dir = backup_dir / vault_code
+    manifests_dir = vault_backup_dir / "manifests"
+    referenced = set()
+    removed_versions = 0
+
+    for manifest_path in sorted(manifests_dir.glob("*.jsonl")):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            versions = [json.loads(line) for line in f if line.strip()]
+        kept = apply_retention(versions, retention) if retention else versions
+        if len(kept) < len(versions):
+            _atomic_write_lines(manifest_path, kept)
+            removed_versions += len(versions) - len(kept)
+        referenced.update(v["hash"] for v in kept)
+
+    removed_blobs = 0
+    cutoff = time.time() - BLOB_GRACE_SECONDS
+    for blob_path in (vault_backup_dir / "objects").glob("*/*.gz"):
+        if blob_path.name[: -len(".gz")] in referenced:
+            continue
+        try:
+            if blob_path.stat().st_mtime < cutoff:
+                blob_path.unlink()
+                removed_blobs += 1
+        except FileNotFoundError:
+            pass
+    print(
+        f"Pruned {removed_versions} backup versions and {removed_blobs} "
+        f"unreferenced blobs from vault '{vault_code}'."
+    )
+
+
+def _store_blob(vault_backup_dir: Path, content: bytes) -> str:
+    """
+    Store content unless it's already in the store, returning its hash. A blob
+    that is already stored is touched, so prune_backups sees it as new.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    blob_path = _blob_path(vault_backup_dir, content_hash)
+    try:
+        os.utime(blob_path)
+    except FileNotFoundError:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _tmp_path(blob_path)
+        tmp_path.write_bytes(gzip.compress(content))
+        os.replace(tmp_path, blob_path)
+    return content_hash
+
+
+def _blob_path(vault_backup_dir: Path, content_hash: str) -> Path:
+    return vault_backup_dir / "objects" / content_hash[:2] / f"{content_hash}.gz"
+
+
+def _manifest_path(vault_code: str, filename: str, backup_dir: Path) -> Path:
+    # Quote the name so notes in subfolders get a flat manifest file
+    return backup_dir / vault_code / "manifests" / f"{quote(filename, safe='')}.jsonl"
+
+
+def _tmp_path(path: Path) -> Path:
+    # Unique per write, as blobs and manifests are written from several threads
+    return path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+
+
+def _atomic_write_lines(path: Path, versions: list[dict]) -> None:
+    tmp_path = _tmp_path(path)
+    tmp_path.write_text(
+        "".join(json.dumps(v) + "\n" for v in versions), encoding="utf-8"
+    )
+    os.replace(tmp_path, path)
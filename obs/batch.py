@@ -0,0 +1,189 @@
+# obs/batch.py
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from obs.capture import run_captured
+from obs.cli import run_action
+from obs.config import load_config
+from obs.llm import size_client
+from obs.markdown import scope_sections
+
+
+def run_batch(jobs_path: Path, concurrency: int, coalesce: bool = False):
+    """
+    Run every job in a JSONL file, one JSON object per line:
+        {"vault": "P", "action": "append", "filename": "MyNote", "instruction": "..."}
+
+    For 'create' jobs the instruction is the note content. Insert jobs may also
+    set "edits": true. Up to `concurrency` jobs run at once, sharing one OpenAI
+    client and connection pool, while jobs that target the same note run one
+    at a time in file order. One JSON result line is printed per job as it
+    finishes.
+
+    With `coalesce`, consecutive insert jobs for the same note are run as one
+    insert (see _coalesce), and each of them reports its result.
+    """
+    if not jobs_path.exists():
+        print(f"Error: Jobs file '{jobs_path}' does not exist.")
+        sys.exit(1)
+
+    config = load_config()
+    size_client(config, concurrency)
+
+    failed = asyncio.run(_run_jobs(config, jobs_path, concurrency, coalesce))
+    if failed:
+        sys.exit(1)
+
+
+async def _run_jobs(
+    config: dict, jobs_path: Path, concurrency: int, coalesce: bool
+) -> int:
+    """
+    Schedule every job in the file and return the number that failed.
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    note_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        entries = [
+            ([line_number], line)
+            for line_number, line in enumerate(f, start=1)
+            if line.strip()
+        ]
+    if coalesce:
+        entries = _coalesce(entries)
+
+    tasks = [
+        asyncio.create_task(_run_job(config, line_numbers, line, semaphore, note_locks))
+        for line_numbers, line in entries
+    ]
+    results = await asyncio.gather(*tasks)
+    return sum(results)
+
+
+def _coalesce(entries: list[tuple[list[int], str]]) -> list[tuple[list[int], str]]:
+    """
+    Combine each run of insert jobs for the same note, not interrupted by any
+    other job for that note, into one job carrying all their instructions
+    (one per line). Returns (line numbers, job line) pairs in file order.
+    """
+    combined: list[tuple[list[int], dict | str]] = []
+    # Index in `combined` of the insert still open for more jobs, per note
+    open_inserts: dict[tuple, int] = {}
+    for line_numbers, line in entries:
+        try:
+            job = json.loads(line)
+            note = (str(job["vault"]), str(job["filename"]))
+            action = job["action"].lower()
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            combined.append((line_numbers, line))
+            continue
+
+        index = open_inserts.pop(note, None)
+        if action == "insert":
+            if index is not None:
+                previous = combined[index][1]
+                if previous.get("edits", False) == job.get("edits", False):
+                    combined[index][0].extend(line_numbers)
+                    previous["instruction"] = (
+                        f"{previous.get('instruction', '')}\n"
+                        f"{job.get('instruction', '')}"
+                    )
+                    open_inserts[note] = index
+                    continue
+            open_inserts[note] = len(combined)
+        combined.append((line_numbers, job))
+
+    return [
+        (line_numbers, job if isinstance(job, str) else json.dumps(job))
+        for line_numbers, job in combined
+    ]
+
+
+async def _run_job(
+    config: dict,
+    line_numbers: list[int],
+    line: str,
+    semaphore: asyncio.Semaphore,
+    note_locks: dict[tuple[str, str], asyncio.Lock],
+) -> int:
+    """
+    Run a single job once its note is free and a slot is available, and print
+    a result line for each of the job lines it was made from. Returns the
+    number of job lines that failed.
+    """
+    try:
+        job = json.loads(line)
+        vault_code = job["vault"]
+        action = job["action"].lower()
+        filename = job["filename"]
+        instruction = job.get("instruction", "")
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+        for line_number in line_numbers:
+            _emit(
+                {"line": line_number, "status": "error", "output": f"Invalid job: {e}"}
+            )
+        return len(line_numbers)
+
+    # Locks are created in file order, so jobs on the same note keep their order
+    lock = note_locks.setdefault((vault_code, filename), asyncio.Lock())
+    async with lock, semaphore:
+        start = time.perf_counter()
+        exit_code, output = await asyncio.to_thread(
+            _execute,
+            config,
+            vault_code,
+            action,
+            filename,
+            instruction,
+            bool(job.get("edits", False)),
+            coalesced=len(line_numbers) > 1,
+        )
+        elapsed = time.perf_counter() - start
+
+    for line_number in line_numbers:
+        result = {
+            "line": line_number,
+            "vault": vault_code,
+            "action": action,
+            "filename": filename,
+            "status": "ok" if exit_code == 0 else "error",
+            "seconds": round(elapsed, 3),
+            "output": output,
+        }
+        if len(line_numbers) > 1:
+            result["coalesced"] = len(line_numbers)
+        _emit(result)
+    return 0 if exit_code == 0 else len(line_numbers)
+
+
+def _execute(
+    config: dict,
+    vault_code: str,
+    action: str,
+    filename: str,
+    instruction: str,
+    edits: bool,
+    coalesced: bool = False,
+) -> tuple[int, str]:
+    """
+    Run one action in a worker thread, returning its exit code and everything
+    it printed. A coalesced insert is sent the whole note, as its instructions
+    may belong in different sections.
+    """
+    # Each job runs in its own copy of the context, so this only applies here
+    scope_sections.set(not coalesced)
+    return run_captured(
+        run_action, config, vault_code, action, filename, instruction, edits=edits
+    )
+
+
+def _emit(result: dict):
+    print(json.dumps(result), flush=True)
@@ -0,0 +1,64 @@
+# obs/bench.py
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def bench_startup(runs: int) -> dict:
+    """
+    Measure the cold-start time of `obs [vault] create` by running it in fresh
+    interpreters against a throwaway vault and config, compared with the time
+    to start a bare interpreter. Prints a summary and returns the timings in
+    milliseconds.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        vault_path = tmp_path / "vault"
+        vault_path.mkdir()
+        config_path = tmp_path / "obs_config.yaml"
+        config_path.write_text(
+            f"vaults:\n  B: {vault_path}\n"
+            f"backup_dir: {tmp_path / 'backups'}\n"
+            'openai_api_key: "sk-bench"\n',
+            encoding="utf-8",
+        )
+        env = dict(
+            os.environ, OBS_CONFIG=str(config_path), XDG_CACHE_HOME=str(tmp_path)
+        )
+
+        interpreter = [
+            _time_ms([sys.executable, "-c", "pass"], env) for _ in range(runs)
+        ]
+        create = [
+            _time_ms([sys.executable, "-m", "obs.cli", "B", "create", f"Note{i}"], env)
+            for i in range(runs)
+        ]
+
+    # The first create run has no config snapshot yet, so report it separately
+    results = {
+        "runs": runs,
+        "interpreter_ms": round(statistics.median(interpreter), 2),
+        "create_first_ms": round(create[0], 2),
+        "create_median_ms": round(statistics.median(create), 2),
+        "create_min_ms": round(min(create), 2),
+        "create_max_ms": round(max(create), 2),
+    }
+    results["overhead_ms"] = round(
+        results["create_median_ms"] - results["interpreter_ms"], 2
+    )
+
+    print(f"Startup over {runs} runs:")
+    for name, value in results.items():
+        if name != "runs":
+            print(f"  {name}: {value}")
+    return results
+
+
+def _time_ms(command: list[str], env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,142 @@
+# obs/cache.py
+import hashlib
+import json
+import os
+import threading
+from contextvars import ContextVar
+
+from obs.config import CACHE_DIR
+
+RESPONSE_CACHE_DIR = CACHE_DIR / "responses"
+STATS_PATH = CACHE_DIR / "response_cache_stats.json"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# Set per command (and so per daemon connection or batch job) by cli.run_action
+cache_enabled: ContextVar[bool] = ContextVar("cache_enabled", default=True)
+cache_max_bytes: ContextVar[int] = ContextVar(
+    "cache_max_bytes", default=DEFAULT_MAX_BYTES
+)
+
+_stats_lock = threading.Lock()
+
+
+def cache_key(model: str, temperature: float, messages: list[dict], **kwargs) -> str:
+    """
+    Hash everything that determines a completion: the model, temperature,
+    messages (system prompt, any fixtures, note content and instruction) and
+    any other request options such as the response format.
+    """
+    request = {
+        "model": model,
+        "temperature": temperature,
+        "messages": messages,
+        "options": kwargs,
+    }
+    encoded = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_response(key: str) -> str | None:
+    """
+    Return the cached response for key, or None on a miss or when the cache is
+    disabled. A hit marks the entry as most recently used.
+    """
+    if not cache_enabled.get():
+        return None
+
+    path = RESPONSE_CACHE_DIR / f"{key}.json"
+    try:
+        content = json.loads(path.read_text(encoding="utf-8"))["content"]
+        os.utime(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        _count("misses")
+        return None
+    _count("hits")
+    return content
+
+
+def put_response(key: str, content: str) -> None:
+    """
+    Store a response, then evict least recently used entries until the cache
+    fits within its size cap. Failing to write the cache is not an error.
+    """
+    if not cache_enabled.get() or content is None:
+        return
+
+    path = RESPONSE_CACHE_DIR / f"{key}.json"
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        RESPONSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps({"content": content}), encoding="utf-8")
+        os.replace(tmp_path, path)
+        _evict(cache_max_bytes.get())
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def cache_stats() -> dict:
+    """
+    Return the hit/miss counters and the current number and size of entries.
+    """
+    try:
+        stats = json.loads(STATS_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        stats = {"hits": 0, "misses": 0}
+    entries = _entries()
+    stats["entries"] = len(entries)
+    stats["bytes"] = sum(size for _, _, size in entries)
+    return stats
+
+
+def clear_cache() -> int:
+    """
+    Delete every cached response and reset the counters, returning the number
+    of entries deleted.
+    """
+    entries = _entries()
+    for path, _, _ in entries:
+        path.unlink(missing_ok=True)
+    STATS_PATH.unlink(missing_ok=True)
+    return len(entries)
+
+
+def _entries() -> list:
+    """Return (path, mtime, size) for every cached response."""
+    entries = []
+    try:
+        with os.scandir(RESPONSE_CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    path = RESPONSE_CACHE_DIR / entry.name
+                    entries.append((path, stat.st_mtime, stat.st_size))
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _evict(max_bytes: int) -> None:
+    entries = _entries()
+    total = sum(size for _, _, size in entries)
+    # Oldest access time first
+    for path, _, size in sorted(entries, key=lambda entry: entry[1]):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _count(counter: str) -> None:
+    with _stats_lock:
+        try:
+            stats = json.loads(STATS_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            stats = {"hits": 0, "misses": 0}
+        stats[counter] = stats.get(counter, 0) + 1
+        try:
+            tmp_path = STATS_PATH.with_suffix(f".{os.getpid()}.tmp")
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(stats), encoding="utf-8")
+            os.replace(tmp_path, STATS_PATH)
+        except OSError:
+            pass
@@ -0,0 +1,68 @@
+# obs/capture.py
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that sends each thread's writes to that thread's
+    capture buffer if it has one, and to the real stdout otherwise.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return self.default if buffer is None else buffer
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+
+_install_lock = threading.Lock()
+
+
+@contextmanager
+def capture_output(target=None):
+    """
+    Capture everything the current thread prints while the block runs, without
+    affecting output from other threads. Output is written to `target` if
+    given, or a new StringIO otherwise. Yields the object being written to.
+    """
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        proxy = sys.stdout
+
+    buffer = io.StringIO() if target is None else target
+    previous = getattr(proxy.local, "buffer", None)
+    proxy.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        proxy.local.buffer = previous
+
+
+def run_captured(function, *args, **kwargs) -> tuple[int, str]:
+    """
+    Call function, capturing everything it prints in the current thread, and
+    return its exit code (as passed to sys.exit, 1 for any other exception
+    and 0 if it returns) and its output.
+    """
+    with capture_output() as output:
+        try:
+            function(*args, **kwargs)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"Error: {e}")
+            exit_code = 1
+    return exit_code, output.getvalue().strip()
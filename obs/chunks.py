@@ -0,0 +1,201 @@
+# obs/chunks.py
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from obs.fileio import atomic_writer
+from obs.markdown import WORD_RE, Section, parse_sections, scan_sections, score_sections
+
+# Rough size of a token for English prose, used to estimate token counts
+# locally without a tokenizer
+CHARS_PER_TOKEN = 4
+# gpt-4o's context window, less room for the prompts and instruction: the
+# most of a note that can be sent at all
+CONTEXT_TOKENS = 128_000 - 4_000
+# gpt-4o's limit on the tokens of one response. An insert gets the note (or
+# section) it sends back whole, so it can send at most this much, less room
+# for the content added to it
+OUTPUT_TOKENS = 16_384
+INSERT_TOKENS = OUTPUT_TOKENS - 4_096
+DEFAULT_TOKEN_BUDGET = INSERT_TOKENS
+
+# Instruction words too common to say anything about where content belongs
+STOP_WORDS = set(
+    (
+        "the and for with that this from into under about add append insert "
+        "update note section please should new"
+    ).split()
+)
+
+# Set per command by cli.run_action from `chunk_token_budget` in the config
+token_budget: ContextVar[int] = ContextVar("token_budget", default=DEFAULT_TOKEN_BUDGET)
+
+
+def estimate_tokens(size: int) -> int:
+    """Estimate the number of tokens in size characters (or bytes) of text."""
+    return size // CHARS_PER_TOKEN
+
+
+def insert_budget() -> int:
+    """
+    The token budget for inserts, which is never more than INSERT_TOKENS, as
+    a larger note couldn't come back whole.
+    """
+    return min(token_budget.get(), INSERT_TOKENS)
+
+
+def exceeds_budget(file_path: Path, budget: int | None = None) -> bool:
+    """
+    Whether the note is too large to send whole, judged from its size on disk,
+    against `budget` (by default, the token budget).
+    """
+    if budget is None:
+        budget = token_budget.get()
+    return estimate_tokens(file_path.stat().st_size) > budget
+
+
+def fits_output(file_path: Path) -> bool:
+    """
+    Whether the note can be sent for an insert whole at all, whatever the
+    token budget.
+    """
+    return not exceeds_budget(file_path, INSERT_TOKENS)
+
+
+def select_chunk(
+    file_path: Path, instruction: str, keywords: dict[str, list[str]] | None = None
+) -> tuple[Section, list[Section]] | None:
+    """
+    Pick the section of a large note to send in its place: the section within
+    the insert budget that best matches the instruction, by heading (see
+    markdown.score_sections) and then by how many of the instruction's words
+    appear in its body. Ties go to the outermost section.
+
+    The note is read in two streaming passes and never held in memory whole.
+    Returns the section, with byte offsets into the file, and an outline of
+    its enclosing and enclosed headings; or None if no section that fits
+    matches the instruction at all.
+    """
+    with open(file_path, "rb") as f:
+        sections = scan_sections(f)
+    limit = insert_budget() * CHARS_PER_TOKEN
+    candidates = [s for s in sections if s.end - s.start <= limit]
+    if not candidates:
+        return None
+
+    heading_scores = {
+        id(s): score for score, s in score_sections(candidates, instruction, keywords)
+    }
+    body_scores = _body_scores(file_path, candidates, instruction)
+
+    def rank(section: Section):
+        return (
+            heading_scores.get(id(section), 0),
+            body_scores[id(section)],
+            section.end - section.start,
+        )
+
+    best = max(candidates, key=rank)
+    if rank(best)[:2] == (0, 0):
+        return None
+
+    outline = [
+        s
+        for s in sections
+        if (s.start <= best.start and s.end >= best.end)
+        or (best.start <= s.start and s.end <= best.end)
+    ]
+    return best, outline
+
+
+def read_span(file_path: Path, start: int, end: int) -> str:
+    """Read the text between two byte offsets of a note."""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).decode("utf-8")
+
+
+def read_tail(file_path: Path) -> str:
+    """
+    Read the end of a note, up to the token budget. The tail starts at a
+    heading if there is one within it, and at a line boundary otherwise.
+    """
+    limit = token_budget.get() * CHARS_PER_TOKEN
+    with open(file_path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(max(size - limit, 0))
+        data = f.read()
+    if size > limit:
+        data = data[data.find(b"\n") + 1 :]
+
+    tail = data.decode("utf-8")
+    sections = parse_sections(tail)
+    return tail[sections[0].start :] if sections else tail
+
+
+def splice_file(
+    file_path: Path,
+    start: int,
+    end: int,
+    replacement: str,
+    expect: tuple[int, int] | None = None,
+) -> None:
+    """
+    Atomically replace the bytes between start and end of a note, streaming
+    the rest of the file across rather than reading it into memory. With
+    `expect`, raises NoteChanged if the note changes in the meantime (see
+    fileio.atomic_writer).
+    """
+    with (
+        open(file_path, "rb") as src,
+        atomic_writer(file_path, binary=True, expect=expect) as dst,
+    ):
+        _copy(src, dst, start)
+        dst.write(replacement.encode("utf-8"))
+        src.seek(end)
+        _copy(src, dst, None)
+
+
+def _body_scores(
+    file_path: Path, sections: list[Section], instruction: str
+) -> dict[int, int]:
+    """
+    Count how many distinct words of the instruction appear in each section.
+    """
+    wanted = {
+        word
+        for word in WORD_RE.findall(instruction.lower())
+        if len(word) >= 3 and word not in STOP_WORDS
+    }
+    offsets, found = [], []
+    pos = 0
+    with open(file_path, "rb") as f:
+        for line in f:
+            words = wanted.intersection(
+                WORD_RE.findall(line.decode("utf-8", errors="replace").lower())
+            )
+            if words:
+                offsets.append(pos)
+                found.append(words)
+            pos += len(line)
+
+    scores = {}
+    for section in sections:
+        words = set()
+        first = bisect_left(offsets, section.start)
+        last = bisect_left(offsets, section.end)
+        for line_words in found[first:last]:
+            words |= line_words
+        scores[id(section)] = len(words)
+    return scores
+
+
+def _copy(src, dst, length: int | None, chunk_size: int = 1024 * 1024) -> None:
+    """Copy length bytes (or everything, if None) from src to dst."""
+    while length is None or length > 0:
+        data = src.read(chunk_size if length is None else min(chunk_size, length))
+        if not data:
+            break
+        dst.write(data)
+        if length is not None:
+            length -= len(data)
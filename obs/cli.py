@@ -1,38 +1,290 @@
 # obs/cli.py
+import contextlib
+import io
+import os
 import sys
+import time
 from pathlib import Path
 
-from obs.backup import backup_note
-from obs.commands.cmd_append import append_file
-from obs.commands.cmd_create import create_file
-from obs.commands.cmd_create_org import create_org
-from obs.commands.cmd_create_person import create_person
-from obs.commands.cmd_insert import insert_file
-from obs.commands.cmd_insert_crm import insert_file_crm
-from obs.config import load_config
+from obs.config import SOCKET_PATH, load_config
+from obs.locks import note_lock
+from obs.trace import span
+
+# Commands are imported inside the branch that runs them, so that e.g. `create`
+# never pays for importing openai.
+
+VAULT_ACTIONS = (
+    "create",
+    "append",
+    "insert",
+    "insert-many",
+    "import",
+    "history",
+    "restore",
+    "prune",
+    "index",
+    "search",
+    "backlinks",
+)
+COMMANDS = ("batch", "watch", "cache", "stats", "serve")
+# Actions on an existing note, whose name may be completed or resolved
+NOTE_ACTIONS = ("append", "insert", "history", "restore", "backlinks")
+
+
+def pop_flag(args: list[str], flag: str) -> bool:
+    """
+    Remove every occurrence of `flag` from args, returning whether it was present.
+    """
+    present = flag in args
+    args[:] = [arg for arg in args if arg != flag]
+    return present
+
+
+def pop_option(args: list[str], option: str, default: str) -> str:
+    """
+    Remove `option` and the value following it from args, returning the value,
+    or `default` if the option is not present.
+    """
+    if option not in args:
+        return default
+    index = args.index(option)
+    if index + 1 >= len(args):
+        print(f"Error: Option '{option}' requires a value.")
+        sys.exit(1)
+    value = args[index + 1]
+    del args[index : index + 2]
+    return value
 
 
 def main():
     """
     Entry point: usage:
         obs [vault_code] create [filename] [content (optional)]
-        obs [vault_code] append [filename] [instruction]
-        obs [vault_code] insert [filename] [instruction]
+        obs [vault_code] append [--stream] [filename] [instruction]
+        obs [vault_code] insert [--edits] [filename] [instruction]
+        obs [vault_code] insert-many [--edits] [--concurrency N] [text]
+        obs [vault_code] import [--merge] [--concurrency N] [contacts.csv|.vcf]
+        obs [vault_code] history [filename]
+        obs [vault_code] restore [filename] [version (optional, default 1)]
+        obs [vault_code] prune
+        obs [vault_code] index
+        obs [vault_code] search [query]
+        obs [vault_code] backlinks [filename]
+        obs batch [--concurrency N] [--coalesce] [jobs.jsonl]
+        obs watch [--concurrency N] [--once] [vault_code]
+        obs cache [stats|clear]
+        obs stats [clear]
+        obs --bench-startup [runs]
+        obs --complete [words]
+        obs serve [--coalesce MS]
+
+    Append and insert also accept --no-cache to bypass the response cache.
+    Any vault action accepts --profile to print a breakdown of where its time
+    went.
+
+    A note name that doesn't exist is resolved to the note it most likely
+    means (see obs.resolve).
+
+    Vault actions other than import are forwarded to `obs serve` if it is
+    running, and run in this process otherwise.
+    """
+    args = sys.argv[1:]
+
+    if args and args[0] == "serve":
+        from obs.daemon import serve
+
+        coalesce = pop_option(args, "--coalesce", "0")
+        if len(args) != 1 or not coalesce.isdigit():
+            print("Usage: obs serve [--coalesce MS]")
+            sys.exit(1)
+        serve(int(coalesce) / 1000)
+        return
+
+    # Like batch, import reads a file named relative to this directory, and
+    # makes no API calls for the daemon to speed up
+    importing = len(args) > 1 and args[1].lower() == "import"
+    forwardable = (
+        args
+        and not importing
+        and args[0]
+        not in ("batch", "watch", "cache", "stats", "--bench-startup", "--complete")
+    )
+    if forwardable and SOCKET_PATH.exists() and not os.environ.get("OBS_NO_DAEMON"):
+        from obs.daemon import forward
+
+        exit_code = forward(args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    run_args(args)
+
+
+def run_args(args: list[str], env: dict | None = None):
+    """
+    Run the command described by the command-line arguments (excluding the
+    program name) in this process. Environment variables are read from `env`
+    if given, e.g. those of an `obs serve` client, and os.environ otherwise.
     """
+    if env is None:
+        env = os.environ
+
+    if args and args[0] == "--bench-startup":
+        from obs.bench import bench_startup
+
+        runs = args[1] if len(args) > 1 else "20"
+        if not runs.isdigit() or int(runs) < 1:
+            print("Usage: obs --bench-startup [runs]")
+            sys.exit(1)
+        bench_startup(int(runs))
+        return
+
+    if args and args[0] == "--complete":
+        for candidate in complete_args(args[1:]):
+            print(candidate)
+        return
+
+    if args and args[0] == "batch":
+        from obs.batch import run_batch
+
+        concurrency = pop_option(args, "--concurrency", "4")
+        coalesce = pop_flag(args, "--coalesce")
+        if len(args) != 2 or not concurrency.isdigit() or int(concurrency) < 1:
+            print("Usage: obs batch [--concurrency N] [--coalesce] [jobs.jsonl]")
+            sys.exit(1)
+        run_batch(Path(args[1]), int(concurrency), coalesce=coalesce)
+        return
+
+    if args and args[0] == "watch":
+        from obs.watch import watch
+
+        concurrency = pop_option(args, "--concurrency", "4")
+        once = pop_flag(args, "--once")
+        if len(args) != 2 or not concurrency.isdigit() or int(concurrency) < 1:
+            print("Usage: obs watch [--concurrency N] [--once] [vault_code]")
+            sys.exit(1)
+        watch(load_config(), args[1], int(concurrency), once=once)
+        return
+
+    if args and args[0] == "cache":
+        from obs.cache import cache_stats, clear_cache
+
+        match args[1:]:
+            case [] | ["stats"]:
+                for name, value in cache_stats().items():
+                    print(f"{name}: {value}")
+            case ["clear"]:
+                print(f"Deleted {clear_cache()} cached responses.")
+            case _:
+                print("Usage: obs cache [stats|clear]")
+                sys.exit(1)
+        return
+
+    if args and args[0] == "stats":
+        from obs.usage import clear_usage, usage_summary
+
+        match args[1:]:
+            case []:
+                summary = usage_summary()
+                if not summary:
+                    print("No API calls recorded yet.")
+                for name, totals in summary.items():
+                    print(name)
+                    for field, value in totals.items():
+                        print(f"  {field}: {value}")
+            case ["clear"]:
+                clear_usage()
+                print("Cleared the usage log.")
+            case _:
+                print("Usage: obs stats [clear]")
+                sys.exit(1)
+        return
+
+    edits = pop_flag(args, "--edits")
+    stream = pop_flag(args, "--stream")
+    use_cache = not pop_flag(args, "--no-cache")
+    profile = pop_flag(args, "--profile")
+    merge = pop_flag(args, "--merge")
+    concurrency = pop_option(args, "--concurrency", "4")
+    if not concurrency.isdigit() or int(concurrency) < 1:
+        print("Error: --concurrency must be a positive number.")
+        sys.exit(1)
+
     # Minimal argument check (need at least vault_code and action)
-    if len(sys.argv) < 3:
-        print("Usage: obs [vault] [create|append|insert] [filename] [command]")
+    if len(args) < 2:
+        print(
+            "Usage: obs [vault] [create|append|insert|insert-many|import|history|"
+            "restore|prune|index|search|backlinks] [filename] [command]"
+        )
         sys.exit(1)
 
-    vault_code = sys.argv[1]
-    action = sys.argv[2].lower()
+    vault_code = args[0]
+    action = args[1].lower()
     # For 'create', filename is mandatory, content is optional
     # For 'append' or 'insert', both filename and command are mandatory
-    filename = sys.argv[3] if len(sys.argv) > 3 else ""
-    command_text = " ".join(sys.argv[4:]) if len(sys.argv) > 4 else ""
+    filename = args[2] if len(args) > 2 else ""
+    command_text = " ".join(args[3:]) if len(args) > 3 else ""
 
     # Load config and vault data
+    started = time.perf_counter()
     config = load_config()
+
+    trace_file = env.get("OBS_TRACE_FILE") or config.get("trace_file")
+    if not profile and not trace_file:
+        run_action(
+            config,
+            vault_code,
+            action,
+            filename,
+            command_text,
+            edits=edits,
+            stream=stream,
+            use_cache=use_cache,
+            concurrency=int(concurrency),
+            merge=merge,
+        )
+        return
+
+    from obs.trace import finish_trace, start_trace
+
+    trace = start_trace(f"{vault_code} {action}", started)
+    trace.add("load_config", started, time.perf_counter())
+    exit_code = 0
+    try:
+        run_action(
+            config,
+            vault_code,
+            action,
+            filename,
+            command_text,
+            edits=edits,
+            stream=stream,
+            use_cache=use_cache,
+            concurrency=int(concurrency),
+            merge=merge,
+        )
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+        raise
+    finally:
+        finish_trace(trace, profile, trace_file, exit_code)
+
+
+def run_action(
+    config: dict,
+    vault_code: str,
+    action: str,
+    filename: str,
+    command_text: str,
+    edits: bool = False,
+    stream: bool = False,
+    use_cache: bool = True,
+    concurrency: int = 4,
+    merge: bool = False,
+):
+    """
+    Validate the vault and run a single create/append/insert action against it.
+    Exits via sys.exit(1) on any error, like the commands themselves.
+    """
     vaults = config.get("vaults", {})
     openai_api_key = config.get("openai_api_key", None)
     backup_dir_str = config.get("backup_dir", None)
@@ -52,13 +304,25 @@ def main():
         sys.exit(1)
 
     backup_dir = Path(backup_dir_str) if backup_dir_str else None
+    retention = config.get("backup_retention", None)
 
-    # Single check for actions that require the OpenAI API key
-    # 'create' does NOT require a key, 'append'/'insert' DO require it
-    if not openai_api_key:
+    # Single check for actions that call the API, and so require the key. CRM
+    # inserts only call it for what the fast path can't do, and check then.
+    calls_api = action in ("append", "insert", "insert-many")
+    if action == "insert" and vault_code.upper() == "C":
+        calls_api = False
+    if calls_api and not openai_api_key:
         print("Error: No OpenAI API key found in config.")
         sys.exit(1)
 
+    # A mistyped note name, or an alias, is resolved before anything is done.
+    # Only append and insert need the note to exist; the rest take the name
+    # as given if no note matches, e.g. to see the backups of a deleted note.
+    if action in NOTE_ACTIONS and filename:
+        filename = _resolve_filename(
+            vault_code, vault_path, filename, required=action in ("append", "insert")
+        )
+
     # Dispatch
     match action:
         case "create":
@@ -69,36 +333,292 @@ def main():
 
             # Check if vault code is "C" (custom logic for org vs. person)
             if vault_code.upper() == "C":
-                create_person(vault_path, filename, command_text)
+                from obs.commands.cmd_create_person import create_person as create
             else:
-                create_file(vault_path, filename, command_text)
+                from obs.commands.cmd_create import create_file as create
+
+            with note_lock(vault_path, filename):
+                create(vault_path, filename, command_text)
 
         case "append":
             # For append, filename + command_text are mandatory
             if not filename or not command_text:
-                print("Usage: obs [vault] append [filename] [instruction]")
+                print("Usage: obs [vault] append [--stream] [filename] [instruction]")
                 sys.exit(1)
-            backup_note(vault_code, vault_path, filename, backup_dir)
-            append_file(vault_path, filename, command_text, openai_api_key)
+
+            with span("import"):
+                from obs.backup import finish_backup, start_backup
+                from obs.commands.cmd_append import append_file
+
+            _configure_cache(config, use_cache)
+            _configure_usage(vault_code, action)
+            _configure_chunks(config)
+            _configure_requests(config, vault_code)
+            with note_lock(vault_path, filename):
+                # The backup is recorded while the API request is in flight
+                backup = start_backup(
+                    vault_code, vault_path, filename, backup_dir, retention
+                )
+                try:
+                    append_file(
+                        vault_path,
+                        filename,
+                        command_text,
+                        openai_api_key,
+                        stream=stream,
+                    )
+                finally:
+                    finish_backup(backup)
 
         case "insert":
             # For insert, filename + command_text are mandatory
             if not filename or not command_text:
-                print("Usage: obs [vault] insert [filename] [instruction]")
+                print("Usage: obs [vault] insert [--edits] [filename] [instruction]")
                 sys.exit(1)
 
-            backup_note(vault_code, vault_path, filename, backup_dir)
-            if vault_code.upper() == "C":
-                insert_file_crm(vault_path, filename, command_text, openai_api_key)
-            else:
-                insert_file(vault_path, filename, command_text, openai_api_key)
+            with span("import"):
+                from obs.backup import finish_backup, start_backup
+
+                if vault_code.upper() == "C":
+                    from obs.commands.cmd_insert_crm import insert_file_crm as insert
+                else:
+                    from obs.commands.cmd_insert import insert_file as insert
+
+            _configure_cache(config, use_cache)
+            _configure_usage(vault_code, action)
+            _configure_chunks(config)
+            _configure_requests(config, vault_code)
+
+            with note_lock(vault_path, filename):
+                # The backup is recorded while the API request is in flight
+                backup = start_backup(
+                    vault_code, vault_path, filename, backup_dir, retention
+                )
+                try:
+                    insert(
+                        vault_path, filename, command_text, openai_api_key, edits=edits
+                    )
+                finally:
+                    finish_backup(backup)
+
+        case "insert-many":
+            # The text is everything after the action, and names the notes
+            text = " ".join(part for part in (filename, command_text) if part)
+            if not text:
+                print(
+                    "Usage: obs [vault] insert-many [--edits] [--concurrency N] [text]"
+                )
+                sys.exit(1)
+
+            from obs.commands.cmd_insert_many import insert_many
+
+            insert_many(
+                config,
+                vault_code,
+                vault_path,
+                text,
+                edits=edits,
+                use_cache=use_cache,
+                concurrency=concurrency,
+            )
+
+        case "import":
+            # The contacts file takes the place of the filename
+            if not filename or command_text:
+                print(
+                    "Usage: obs [vault] import [--merge] [--concurrency N] "
+                    "[contacts.csv|.vcf]"
+                )
+                sys.exit(1)
+            if vault_code.upper() != "C":
+                print("Error: Contacts can only be imported into the 'C' vault.")
+                sys.exit(1)
+
+            from obs.commands.cmd_import import import_contacts
+
+            import_contacts(
+                vault_code,
+                vault_path,
+                Path(filename).expanduser(),
+                backup_dir,
+                retention,
+                merge=merge,
+                concurrency=concurrency,
+            )
+
+        case "history":
+            if not filename:
+                print("Usage: obs [vault] history [filename]")
+                sys.exit(1)
+
+            from obs.backup import show_history
+
+            show_history(vault_code, filename, backup_dir)
+
+        case "restore":
+            # Versions are numbered from 1 (most recent) as shown by history
+            version = command_text or "1"
+            if not filename or not version.isdigit():
+                print("Usage: obs [vault] restore [filename] [version (optional)]")
+                sys.exit(1)
+
+            from obs.backup import restore_note
+
+            with note_lock(vault_path, filename):
+                restore_note(vault_code, vault_path, filename, backup_dir, int(version))
+
+        case "prune":
+            from obs.backup import prune_backups
+
+            prune_backups(vault_code, backup_dir, retention)
+
+        case "index":
+            from obs.commands.cmd_index import index_vault
+
+            index_vault(vault_code, vault_path)
+
+        case "search":
+            # The query is everything after the action, like an instruction
+            query = " ".join(part for part in (filename, command_text) if part)
+            if not query:
+                print("Usage: obs [vault] search [query]")
+                sys.exit(1)
+
+            from obs.commands.cmd_index import search_vault
+
+            search_vault(vault_code, vault_path, query)
+
+        case "backlinks":
+            if not filename:
+                print("Usage: obs [vault] backlinks [filename]")
+                sys.exit(1)
+
+            from obs.commands.cmd_index import show_backlinks
+
+            show_backlinks(vault_code, vault_path, filename)
 
         case _:
             print(
-                f"Error: Unrecognized action '{action}'. Use create, append, or insert."
+                f"Error: Unrecognized action '{action}'. Use create, append, insert, "
+                "insert-many, import, history, restore, prune, index, search, or "
+                "backlinks."
             )
             sys.exit(1)
 
 
+def complete_args(words: list[str]) -> list[str]:
+    """
+    Return the shell completions for the last of words, the arguments typed
+    so far after `obs`: commands and vault codes, then actions, then note
+    names. Uses the cached config and note names, so it never parses YAML
+    unless the config has changed, or imports openai, and prints nothing but
+    completions.
+    """
+    if not words:
+        words = [""]
+    partial = words[-1].lstrip("'\"")
+    # The words typed so far, without flags and option values
+    typed = []
+    options = iter(words[:-1])
+    for word in options:
+        if word in ("--concurrency", "--coalesce"):
+            next(options, None)
+        elif not word.startswith("-"):
+            typed.append(word)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            vaults = load_config().get("vaults", {})
+        except SystemExit:
+            vaults = {}
+
+    match typed:
+        case []:
+            candidates = [*vaults, *COMMANDS]
+        case ["watch"]:
+            candidates = list(vaults)
+        case ["cache"]:
+            candidates = ["stats", "clear"]
+        case ["stats"]:
+            candidates = ["clear"]
+        case [vault_code] if vault_code in vaults:
+            candidates = list(VAULT_ACTIONS)
+        case [vault_code, action] if vault_code in vaults and action in NOTE_ACTIONS:
+            from obs.resolve import complete_names
+
+            vault_path = Path(vaults[vault_code]).expanduser()
+            if not vault_path.is_dir():
+                return []
+            return complete_names(vault_code, vault_path, partial)
+        case _:
+            candidates = []
+    return [c for c in candidates if c.casefold().startswith(partial.casefold())]
+
+
+def _resolve_filename(
+    vault_code: str, vault_path: Path, filename: str, required: bool = True
+) -> str:
+    """
+    Return the name of the note filename means, if it doesn't name one exactly
+    (see obs.resolve.resolve_note). If there's no single such note, exits
+    listing the closest, or with `required` false returns filename unchanged.
+    """
+    if (vault_path / f"{filename}.md").is_file():
+        return filename
+
+    from obs.resolve import resolve_note
+
+    resolved, suggestions = resolve_note(vault_code, vault_path, filename)
+    if resolved is not None:
+        print(f"Using note '{resolved}' for '{filename}'.")
+        return resolved
+    if not required:
+        return filename
+
+    print(f"Error: No note named '{filename}' in vault '{vault_code}'.")
+    if suggestions:
+        print("Did you mean:")
+        for suggestion in suggestions:
+            print(f"  {suggestion}")
+    sys.exit(1)
+
+
+def _configure_cache(config: dict, use_cache: bool):
+    """
+    Apply the response cache settings from the config for the current command.
+    """
+    from obs.cache import cache_enabled, cache_max_bytes
+
+    cache_enabled.set(use_cache and config.get("response_cache", True))
+    cache_max_bytes.set(int(config.get("response_cache_max_mb", 50) * 1024 * 1024))
+
+
+def _configure_chunks(config: dict):
+    """
+    Apply the token budget above which notes are processed in chunks.
+    """
+    from obs.chunks import DEFAULT_TOKEN_BUDGET, token_budget
+
+    token_budget.set(int(config.get("chunk_token_budget", DEFAULT_TOKEN_BUDGET)))
+
+
+def _configure_requests(config: dict, vault_code: str):
+    """
+    Apply the vault's timeouts, retries and hedging to API requests.
+    """
+    from obs.retry import RequestPolicy, request_policy
+
+    request_policy.set(RequestPolicy.from_config(config, vault_code))
+
+
+def _configure_usage(vault_code: str, action: str):
+    """
+    Label API calls made by the current command in the usage log.
+    """
+    from obs.usage import usage_command
+
+    usage_command.set(f"{vault_code} {action}")
+
+
 if __name__ == "__main__":
     main()
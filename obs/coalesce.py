@@ -0,0 +1,90 @@
+# obs/coalesce.py
+import threading
+import time
+from collections.abc import Callable
+
+from obs.cli import pop_flag
+
+# (vault code, filename, edits, use cache)
+InsertKey = tuple[str, str, bool, bool]
+
+
+def insert_key(args: list[str]) -> tuple[InsertKey, str] | None:
+    """
+    If the command-line arguments are a plain `insert`, return the note and
+    options it applies to and its instruction; otherwise None. Inserts with
+    --profile aren't coalesced, so that their profile is their own.
+    """
+    args = list(args)
+    edits = pop_flag(args, "--edits")
+    use_cache = not pop_flag(args, "--no-cache")
+    if pop_flag(args, "--profile") or pop_flag(args, "--stream"):
+        return None
+    if len(args) < 4 or args[1].lower() != "insert":
+        return None
+    return (args[0], args[2], edits, use_cache), " ".join(args[3:])
+
+
+def insert_args(key: InsertKey, instructions: list[str]) -> list[str]:
+    """
+    The command-line arguments for a single insert carrying every instruction,
+    one per line.
+    """
+    vault_code, filename, edits, use_cache = key
+    flags = (["--edits"] if edits else []) + ([] if use_cache else ["--no-cache"])
+    return [vault_code, "insert", *flags, filename, "\n".join(instructions)]
+
+
+class _Group:
+    def __init__(self):
+        self.instructions: list[str] = []
+        self.done = threading.Event()
+        self.result: tuple[int, str] = (1, "")
+
+
+class Coalescer:
+    """
+    Collect insert instructions for the same note that arrive within `window`
+    seconds of the first, and run them as one insert: one API request, one
+    backup and one write. `run` should send a combined insert the whole note
+    (see markdown.scope_sections), as its instructions may belong in
+    different sections. Every caller waits for, and gets back, the result
+    of the combined insert.
+
+    `run(key, instructions)` runs the combined insert and returns its exit
+    code and output.
+    """
+
+    def __init__(
+        self, window: float, run: Callable[[InsertKey, list[str]], tuple[int, str]]
+    ):
+        self.window = window
+        self.run = run
+        self._pending: dict[InsertKey, _Group] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: InsertKey, instruction: str) -> tuple[int, str]:
+        """
+        Add an instruction to the open group for its note, starting one if
+        there isn't one, and wait for the group's result.
+        """
+        with self._lock:
+            group = self._pending.get(key)
+            leader = group is None
+            if leader:
+                group = self._pending[key] = _Group()
+            group.instructions.append(instruction)
+
+        if not leader:
+            group.done.wait()
+            return group.result
+
+        # The first caller collects the rest, then runs the insert for everyone
+        time.sleep(self.window)
+        with self._lock:
+            del self._pending[key]
+        try:
+            group.result = self.run(key, group.instructions)
+        finally:
+            group.done.set()
+        return group.result
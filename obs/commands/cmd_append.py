@@ -4,65 +4,99 @@ from pathlib import Path
 
 from openai import OpenAI
 
+from obs.chunks import exceeds_budget, read_tail
+from obs.fileio import NoteChanged, append_text, atomic_appender
+from obs.llm import chat_completion, get_client, stream_chat_completion
+from obs.prompts import append_messages
+from obs.trace import span
+
 
 def append_file(
-    vault_path: Path, filename: str, user_instruction: str, openai_api_key: str
+    vault_path: Path,
+    filename: str,
+    user_instruction: str,
+    openai_api_key: str,
+    stream: bool = False,
 ):
     """
     Load the file from vault_path/filename.md, then request GPT-4o to append content to the end.
+
+    With `stream`, the completion is echoed to stdout as it arrives and written
+    to a temporary copy of the note, which replaces the note only once the
+    stream has finished cleanly.
+
+    Notes over the token budget (see obs.chunks) are never read whole: only
+    their tail is sent as context.
+
+    The completion is appended to the note as it is when the completion
+    arrives, so edits made to it in the meantime are kept.
     """
     file_path = vault_path / f"{filename}.md"
     if not file_path.exists():
         print(f"Error: File '{file_path}' does not exist.")
         sys.exit(1)
 
-    original_content = file_path.read_text(encoding="utf-8")
-
-    system_message = (
-        "You are a helpful assistant specialized in editing Markdown documents. "
-        "You will be given the content of an existing markdown document, along with instructions on appending content. "
-        "You must read the first message from the user, containing the current document content, "
-        "then follow the user's instructions to write new content to append to the end of the note.\n\n"
-        "You must follow the below guidelines:\n"
-        "1. Your response must be a continuation of the existing file, such that concatenating the original content with your response results in a valid Markdown document.\n"
-        "2. Output ONLY markdown content, with no additional commentary, discussion, or follow-up.\n"
-        "3. Maintain correct and valid Markdown structure.\n"
-        "    - You may use features from Obsidian's markdown syntax such as [[wikilinks]] and admonitions.\n"
-        "    - Your response will be concatenated on a NEW LINE at the end of the existing content, account for this in your response.\n"
-        "4. Do NOT escape the Markdown content in your response with any delimiters such as ```markdown or ---.\n"
-        "5. Do not try to modify or restate existing content. Your response with be joined onto the end to produce the final document.\n"
-        "6. Maintain formatting that is consistent with the existing content (e.g. indentation, heading structure, use of lists).\n\n"
-        "The user will now send one message with the current document content, "
-        "followed by another message with instructions on what to append. Follow their instructions closely."
-    )
-
-    user_instruction = (
-        "Instructions on what to append to the above document:\n\n" + user_instruction
-    )
-
-    # Create a new OpenAI client instance
-    client = OpenAI(api_key=openai_api_key)
+    with span("read"):
+        if exceeds_budget(file_path):
+            original_content = read_tail(file_path)
+        else:
+            original_content = file_path.read_text(encoding="utf-8")
+
+    messages = append_messages(original_content, user_instruction)
+
+    # Reuse the process-wide OpenAI client and its connection pool
+    client = get_client(openai_api_key)
+
+    if stream:
+        _append_stream(client, file_path, messages)
+        return
 
     try:
-        completion = client.chat.completions.create(
+        new_content = chat_completion(
+            client,
             model="gpt-4o",
-            messages=[
-                {"role": "developer", "content": system_message},
-                {"role": "user", "content": original_content},
-                {"role": "user", "content": user_instruction},
-            ],
+            messages=messages,
             temperature=0.5,
         )
-        new_content = completion.choices[0].message.content
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
         sys.exit(1)
 
     # Save the new content to the file
-    new_content = original_content + "\n" + new_content
     try:
-        file_path.write_text(new_content, encoding="utf-8")
+        append_text(file_path, "\n" + new_content)
         print(f"Appended content and updated file at: {file_path}")
     except Exception as e:
         print(f"Error writing file '{file_path}': {e}")
         sys.exit(1)
+
+
+def _append_stream(client: OpenAI, file_path: Path, messages: list[dict]):
+    """
+    Stream the completion to stdout and to a temporary copy of the note, then
+    atomically replace the note with it. If the note was changed while
+    streaming, the completion is appended to the changed note instead.
+    """
+    deltas = []
+    try:
+        try:
+            with atomic_appender(file_path) as f:
+                f.write("\n")
+                for delta in stream_chat_completion(
+                    client,
+                    model="gpt-4o",
+                    messages=messages,
+                    temperature=0.5,
+                ):
+                    f.write(delta)
+                    deltas.append(delta)
+                    print(delta, end="", flush=True)
+            print()
+        except NoteChanged:
+            print()
+            append_text(file_path, "\n" + "".join(deltas))
+    except Exception as e:
+        print(f"\nError streaming from OpenAI API, '{file_path}' was not modified: {e}")
+        sys.exit(1)
+
+    print(f"Appended content and updated file at: {file_path}")
@@ -0,0 +1,177 @@
+# obs/commands/cmd_import.py
+import csv
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from obs.backup import backup_note
+from obs.capture import capture_output
+from obs.commands.cmd_create_person import PERSON_TEMPLATE
+from obs.contacts import Contact, fill_contact, read_contacts
+from obs.fileio import note_version
+from obs.locks import note_lock
+from obs.merge import write_note
+
+# Import outcomes, in the order they are reported
+OUTCOMES = ("created", "merged", "unchanged", "skipped", "failed")
+# Failures listed individually in the report
+MAX_FAILURES_SHOWN = 10
+
+
+def import_contacts(
+    vault_code: str,
+    vault_path: Path,
+    contacts_path: Path,
+    backup_dir: Path,
+    retention: dict | None = None,
+    merge: bool = False,
+    concurrency: int = 8,
+):
+    """
+    Create a contact from PERSON_TEMPLATE for every entry in a CSV or vCard
+    file, with its details filled in (see contacts.fill_contact), without
+    calling the API.
+
+    The file is streamed, and notes are written by `concurrency` threads.
+    Contacts that already exist, according to a name index built from one
+    scan of the vault, are skipped; with `merge`, their blank details are
+    filled in instead, after a backup. A summary with the import's
+    throughput is printed at the end.
+    """
+    if not contacts_path.is_file():
+        print(f"Error: File '{contacts_path}' does not exist.")
+        sys.exit(1)
+
+    # Note names by their case-folded form, as contacts differing only in case
+    # are the same person (and the same file on macOS)
+    with os.scandir(vault_path) as entries:
+        existing = {
+            entry.name[:-3].casefold(): entry.name[:-3]
+            for entry in entries
+            if entry.name.endswith(".md")
+        }
+
+    counts = Counter()
+    failures = []
+    lock = threading.Lock()
+    # Keep parsing only a little ahead of the writers
+    slots = threading.BoundedSemaphore(concurrency * 4)
+
+    def record(outcome: str, failure: str | None = None):
+        with lock:
+            counts[outcome] += 1
+            if failure is not None:
+                failures.append(failure)
+
+    def write(contact: Contact, filename: str, exists: bool):
+        try:
+            outcome = _write_contact(
+                vault_code,
+                vault_path,
+                contact,
+                filename,
+                exists,
+                merge,
+                backup_dir,
+                retention,
+            )
+            record(outcome)
+        except Exception as e:
+            record("failed", f"{contact.name}: {e}")
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    error = None
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for contact in read_contacts(contacts_path):
+                filename = contact.filename
+                if not filename:
+                    record("failed", f"'{contact.name}' isn't a valid note name")
+                    continue
+                key = filename.casefold()
+                exists = key in existing
+                if exists and not merge:
+                    record("skipped")
+                    continue
+                filename = existing.setdefault(key, filename)
+                slots.acquire()
+                pool.submit(write, contact, filename, exists)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            error = e
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    print(
+        f"Imported {total} contacts from '{contacts_path.name}' in {elapsed:.1f}s "
+        f"({total / elapsed if elapsed else 0:.0f} contacts/s):"
+    )
+    print("  " + ", ".join(f"{counts[outcome]} {outcome}" for outcome in OUTCOMES))
+    for failure in failures[:MAX_FAILURES_SHOWN]:
+        print(f"  failed: {failure}")
+    if len(failures) > MAX_FAILURES_SHOWN:
+        print(f"  ...and {len(failures) - MAX_FAILURES_SHOWN} more failures")
+
+    if error is not None:
+        print(f"Error reading '{contacts_path}', stopped early: {error}")
+        sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+
+def _write_contact(
+    vault_code: str,
+    vault_path: Path,
+    contact: Contact,
+    filename: str,
+    exists: bool,
+    merge: bool,
+    backup_dir: Path,
+    retention: dict | None,
+) -> str:
+    """
+    Create the contact's note, or with `merge` fill in an existing one,
+    returning the outcome. A new note is created exclusively, so a note that
+    appeared since the vault was scanned is never overwritten.
+    """
+    file_path = vault_path / f"{filename}.md"
+    with note_lock(vault_path, filename):
+        if not exists:
+            if _create(file_path, filename, contact):
+                return "created"
+            if not merge:
+                return "skipped"
+
+        try:
+            version = note_version(file_path)
+            original_content = file_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            # Listed twice in the import, and the first is yet to be written
+            return "created" if _create(file_path, filename, contact) else "skipped"
+        new_content = fill_contact(original_content, contact)
+        if new_content == original_content:
+            return "unchanged"
+
+        # Backups report themselves, which would drown out the summary
+        with capture_output():
+            backup_note(vault_code, vault_path, filename, backup_dir, retention)
+        write_note(file_path, original_content, new_content, version)
+        return "merged"
+
+
+def _create(file_path: Path, filename: str, contact: Contact) -> bool:
+    """
+    Create the contact's note unless it exists, returning whether it did.
+    """
+    content = fill_contact(PERSON_TEMPLATE.format(name=filename), contact)
+    try:
+        with open(file_path, "x", encoding="utf-8") as f:
+            f.write(content)
+        return True
+    except FileExistsError:
+        return False
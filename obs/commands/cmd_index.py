@@ -0,0 +1,47 @@
+# obs/commands/cmd_index.py
+import time
+from contextlib import closing
+from pathlib import Path
+
+from obs.index import backlinks, open_index, search, update_index
+
+
+def index_vault(vault_code: str, vault_path: Path):
+    """
+    Build or incrementally update the vault's index and report what changed.
+    """
+    start = time.perf_counter()
+    with closing(open_index(vault_code)) as conn:
+        stats = update_index(conn, vault_path)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Indexed {stats['notes']} notes in vault '{vault_code}' "
+        f"({stats['updated']} updated, {stats['removed']} removed) in {elapsed:.2f}s"
+    )
+
+
+def search_vault(vault_code: str, vault_path: Path, query: str):
+    """
+    Print the notes whose name, alias or headings match query.
+    """
+    with closing(open_index(vault_code)) as conn:
+        update_index(conn, vault_path)
+        results = search(conn, query)
+    if not results:
+        print(f"No notes matching '{query}'.")
+    for path, reason in results:
+        print(path if reason == "name" else f"{path}  ({reason})")
+
+
+def show_backlinks(vault_code: str, vault_path: Path, filename: str):
+    """
+    Print the notes that link to filename.
+    """
+    with closing(open_index(vault_code)) as conn:
+        update_index(conn, vault_path)
+        paths = backlinks(conn, filename)
+    if not paths:
+        print(f"No notes link to '{filename}'.")
+    for path in paths:
+        print(path)
+
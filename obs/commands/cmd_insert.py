@@ -4,61 +4,227 @@ from pathlib import Path
 
 from openai import OpenAI
 
+from obs.chunks import (
+    exceeds_budget,
+    fits_output,
+    insert_budget,
+    read_span,
+    select_chunk,
+)
+from obs.fileio import note_version
+from obs.llm import chat_completion, get_client
+from obs.markdown import (
+    Section,
+    parse_sections,
+    scope_sections,
+    select_section,
+    splice_section,
+)
+from obs.merge import MergeConflict, splice_note, write_note
+from obs.patch import PatchError, apply_edits, parse_edits
+from obs.prompts import insert_edits_messages, insert_messages, insert_section_messages
+from obs.trace import span
+
 
 def insert_file(
-    vault_path: Path, filename: str, user_instruction: str, openai_api_key: str
+    vault_path: Path,
+    filename: str,
+    user_instruction: str,
+    openai_api_key: str,
+    edits: bool = False,
 ):
     """
     Load the file, let GPT-4o decide where to insert new content, and save the file.
+
+    With `edits`, GPT-4o responds with a list of edit operations that are
+    applied locally, instead of the whole updated document. If the edits
+    can't be applied, the whole document is regenerated as usual.
+
+    Notes over the insert budget (see obs.chunks) are handled by
+    _insert_large instead, unless no section of them matches the instruction.
+
+    If the note is changed by something else while GPT-4o is working, the
+    two sets of changes are merged (see obs.merge).
     """
     file_path = vault_path / f"{filename}.md"
     if not file_path.exists():
         print(f"Error: File '{file_path}' does not exist.")
         sys.exit(1)
 
-    original_content = file_path.read_text(encoding="utf-8")
-
-    system_message = (
-        "You are a helpful assistant specialized in editing Markdown documents. "
-        "You will be given the content of an existing markdown document, along with instructions on adding or modifying content. "
-        "You must read the first message from the user, containing the current document content, "
-        "then follow the user's instructions to update it in their second message.\n\n"
-        "You must follow the below guidelines:\n"
-        "1. Output ONLY markdown content, with no additional commentary, discussion, or follow-up.\n"
-        "2. Maintain correct and valid Markdown structure.\n"
-        "    - You may use features from Obsidian's markdown syntax such as [[wikilinks]] and admonitions.\n"
-        "3. Do NOT escape the Markdown content in your response with any delimiters such as ```markdown or ---.\n"
-        "4. Avoid modifying any existing content that the user has not explicitly asked you to change.\n"
-        "5. Maintain formatting that is consistent with the existing content (e.g. indentation, heading structure, use of lists).\n\n"
-        "The user will now send one message with the current document content, "
-        "followed by another message with instructions on how to update it. Follow their instructions closely"
-    )
+    # Reuse the process-wide OpenAI client and its connection pool
+    client = get_client(openai_api_key)
+
+    if exceeds_budget(file_path, insert_budget()) and _insert_large(
+        client, file_path, user_instruction, edits
+    ):
+        return
+
+    with span("read"):
+        version = note_version(file_path)
+        original_content = file_path.read_text(encoding="utf-8")
+
+    if edits:
+        new_content = _insert_edits(client, original_content, user_instruction)
+        if new_content is not None:
+            _write(file_path, original_content, new_content, version)
+            return
+    else:
+        # Only send the targeted section when the instruction clearly points at one
+        sections = parse_sections(original_content)
+        target = select_section(original_content, sections, user_instruction)
+        if target is not None:
+            new_content = _insert_section(
+                client, original_content, sections, target, user_instruction
+            )
+            if new_content is not None:
+                _write(file_path, original_content, new_content, version)
+                return
+
+    try:
+        new_content = chat_completion(
+            client,
+            model="gpt-4o",
+            messages=insert_messages(original_content, user_instruction),
+            temperature=0.5,
+        )
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        sys.exit(1)
+
+    _write(file_path, original_content, new_content, version)
+
+
+def _insert_large(
+    client: OpenAI, file_path: Path, user_instruction: str, edits: bool
+) -> bool:
+    """
+    Insert into a note over the insert budget. The section that best matches
+    the instruction and fits the budget is read on its own, updated as in
+    _insert_edits or _insert_section, and spliced back into the file without
+    reading the rest of it into memory.
+
+    Returns False if no section matches but the note can still be sent whole
+    (see chunks.fits_output), for the caller to do so. Notes that fit are
+    always sent whole when scope_sections is cleared.
+    """
+    if not scope_sections.get() and fits_output(file_path):
+        return False
+    with span("read.select_chunk"):
+        version = note_version(file_path)
+        chunk = select_chunk(file_path, user_instruction)
+    if chunk is None:
+        if fits_output(file_path):
+            return False
+        print(
+            f"Error: '{file_path}' is too large to insert into whole, and no section "
+            "of it matches the instruction. Try naming the heading to insert under."
+        )
+        sys.exit(1)
+    target, outline = chunk
 
-    user_instruction = (
-        "Instructions to update above document content:\n\n" + user_instruction
+    with span("read"):
+        section_content = read_span(file_path, target.start, target.end)
+    # The section read on its own, as _insert_section expects
+    section = Section(
+        target.level, target.title, target.heading, 0, len(section_content)
     )
+    outline = [section if s is target else s for s in outline]
+
+    new_content = None
+    if edits:
+        new_content = _insert_edits(client, section_content, user_instruction)
+    if new_content is None:
+        new_content = _insert_section(
+            client, section_content, outline, section, user_instruction
+        )
+    if new_content is None:
+        print(f"Error: '{file_path}' was not modified.")
+        sys.exit(1)
+
+    try:
+        splice_note(file_path, target, section_content, new_content, version)
+        print(f"Inserted content and updated file at: {file_path}")
+    except MergeConflict as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error writing file '{file_path}': {e}")
+        sys.exit(1)
+    return True
+
+
+def _insert_section(
+    client: OpenAI,
+    original_content: str,
+    sections: list[Section],
+    target: Section,
+    user_instruction: str,
+) -> str | None:
+    """
+    Send only the target section plus a heading outline to GPT-4o and splice
+    the returned section back into the original content.
+
+    Returns None if the response can't be spliced back in safely.
+    """
+    try:
+        new_section = chat_completion(
+            client,
+            model="gpt-4o",
+            messages=insert_section_messages(
+                original_content, sections, target, user_instruction
+            ),
+            temperature=0.5,
+        )
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        sys.exit(1)
+
+    new_content = splice_section(original_content, target, new_section)
+    if new_content is None:
+        print(
+            f"Warning: Could not splice section '{target.title}', "
+            "falling back to the full document."
+        )
+    return new_content
+
 
-    # Create a new OpenAI client instance
-    client = OpenAI(api_key=openai_api_key)
+def _insert_edits(
+    client: OpenAI, original_content: str, user_instruction: str
+) -> str | None:
+    """
+    Ask GPT-4o for a list of edit operations and apply them to the original
+    content.
 
+    Returns None if the edits can't be applied.
+    """
     try:
-        completion = client.chat.completions.create(
+        response = chat_completion(
+            client,
             model="gpt-4o",
-            messages=[
-                {"role": "developer", "content": system_message},
-                {"role": "user", "content": original_content},
-                {"role": "user", "content": user_instruction},
-            ],
+            messages=insert_edits_messages(original_content, user_instruction),
             temperature=0.5,
+            response_format={"type": "json_object"},
         )
-        new_content = completion.choices[0].message.content
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
         sys.exit(1)
 
     try:
-        file_path.write_text(new_content, encoding="utf-8")
+        return apply_edits(original_content, parse_edits(response))
+    except PatchError as e:
+        print(f"Warning: Could not apply edits ({e}), falling back to a full rewrite.")
+        return None
+
+
+def _write(
+    file_path: Path, original_content: str, new_content: str, version: tuple[int, int]
+):
+    try:
+        write_note(file_path, original_content, new_content, version)
         print(f"Inserted content and updated file at: {file_path}")
+    except MergeConflict as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error writing file '{file_path}': {e}")
         sys.exit(1)
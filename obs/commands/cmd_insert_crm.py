@@ -1,154 +1,229 @@
 # obs/commands/insert_cmd.py
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from openai import OpenAI
+from obs.chunks import CONTEXT_TOKENS, estimate_tokens, insert_budget
+from obs.crm import apply_fast_path
+from obs.fileio import note_version
+from obs.markdown import Section, parse_sections, select_section, splice_section
+from obs.merge import MergeConflict, write_note
+from obs.patch import PatchError, apply_edits, parse_edits
+from obs.prompts import crm_edits_messages, crm_messages, crm_section_messages
+from obs.trace import span
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Hint words for each `##` section of PERSON_TEMPLATE, used to work out which
+# section a piece of information belongs in without asking the model.
+CRM_SECTION_KEYWORDS = {
+    "Details": (
+        "email phone mobile number address lives moved birthday born education "
+        "studied studies degree university school graduated company "
+        "organisation organization works job employer role position title"
+    ).split(),
+    "Relationships": (
+        "partner wife husband girlfriend boyfriend married engaged parent "
+        "mother father mum mom dad child son daughter sibling brother sister "
+        "pet dog cat friend manager colleague boss mentor"
+    ).split(),
+    "Conversations and Events": (
+        "met meeting dinner lunch breakfast coffee drinks talked spoke "
+        "discussed chatted called visited went today yesterday conversation "
+        "event"
+    ).split(),
+    "Notes": (
+        "likes favourite favorite loves hates dislikes barracks supports "
+        "allergic prefers vegetarian vegan"
+    ).split(),
+    "Gifts": "gift present gave".split(),
+    "Tasks": "task todo remind follow need must".split(),
+}
 
 
 def insert_file_crm(
-    vault_path: Path, filename: str, user_instruction: str, openai_api_key: str
+    vault_path: Path,
+    filename: str,
+    user_instruction: str,
+    openai_api_key: str | None,
+    edits: bool = False,
 ):
     """
     Load the file, let GPT-4o decide where to insert new content, and save the file.
+
+    Structured details (email, phone, birthday, address, company, role, dated
+    events and tasks) are first written in directly by obs.crm, and only the
+    rest of the instruction is sent to GPT-4o. If nothing is left, the API
+    isn't called at all, and no API key is needed.
+
+    With `edits`, GPT-4o responds with a list of edit operations that are
+    applied locally, instead of the whole updated contact. If the edits
+    can't be applied, the whole contact is regenerated as usual. Contacts over
+    the insert budget (see obs.chunks), which couldn't come back whole, only
+    ever have a section rewritten or edits applied.
+
+    If the contact is changed by something else in the meantime, the two sets
+    of changes are merged (see obs.merge).
     """
     file_path = vault_path / f"{filename}.md"
     if not file_path.exists():
         print(f"Error: File '{file_path}' does not exist.")
         sys.exit(1)
 
-    original_content = file_path.read_text(encoding="utf-8")
-
-    system_message = (
-        "You are a helpful assistant specialized in editing Markdown documents. "
-        "You maintain a Customer Relationship Management (CRM) system for the user. "
-        "You will be given the content of an existing document in the CRM, along with information to insert into it. "
-        "You must read the first message from the user, containing the current document, "
-        "then insert the information from the user's second message by deciding where it should be placed "
-        "and how it should be formatted into the existing document.\n\n"
-        "You are provided a sample document in the following developer message, and must adhere to this structure. "
-        "You must follow the below guidelines:\n"
-        "1. Output ONLY markdown content, with no additional commentary, discussion, or follow-up.\n"
-        "2. Maintain correct and valid Markdown structure.\n"
-        "    - You must use features from Obsidian's markdown syntax such as [[wikilinks]] as they appear in the sample document.\n"
-        "        - Specifically, [[wikilinks]] are used to link together companies, organisations, people (using [[Fistname Lastname]]), and cities (e.g. [[Melbourne]]).\n"
-        "        - However, you should only link names of people when the full first and last name is known.\n"
-        "3. Do NOT escape the Markdown content in your response with any delimiters such as ```markdown or ---.\n"
-        "4. Avoid modifying any existing content that the user has not explicitly asked you to change.\n"
-        "5. Maintain formatting that is consistent with the existing content (e.g. indentation, heading structure, use of lists).\n"
-        "6. You may reword the content provided by the user to fit the structure, content, and format of the document.\n"
-        "7. You must return the entire document with the new content inserted, your response will overwrite the existing file.\n\n"
-        "The following message contains a sample CRM contact for John Doe. The user will then send a real CRM contact, "
-        "and finally a piece of information for you to insert into the document at the appropriate location. "
-        "Follow their instructions closely."
-    )
-
-    sample_crm_contact = (
-        "# John Doe\n"
-        "\n"
-        "## Details\n"
-        "\n"
-        "### Personal\n"
-        "\n"
-        "- **Email:** jdoe@gmail.com\n"
-        "- **Phone Number:** (+61) 456 789 123\n"
-        "- **Address:** 42 Main Street, Carlton, [[Melbourne]], VIC, 3053, Australia\n"
-        "- **Birthday:** March 1st, 2000\n"
-        "\n"
-        "### Professional \n"
-        "\n"
-        "- **Education:**\n"
-        "	- Bachelor of Science - Data Science\n"
-        "	- Master of Science - Computer Science (AI)\n"
-        "- **Company/organisation:**\n"
-        "	- [[Coca Cola]]\n"
-        "- **Role:**\n"
-        "	- Lead Data Scientist\n"
-        "\n"
-        "## Relationships\n"
-        "\n"
-        "- **Partner:** [[Jane Doe]]\n"
-        "\n"
-        "### Family\n"
-        "\n"
-        "- **Parents:** \n"
-        "	- [[Bob Doe]] (father)\n"
-        "	- [[Jill Doe]] (mother)\n"
-        "- **Children:**\n"
-        "	- [[Jimmy Doe]] (son)\n"
-        "- **Siblings:**\n"
-        "	- [[Jack Doe]] (brother)\n"
-        "\n"
-        "#### Pets\n"
-        "\n"
-        "- Jimbob (goldfish)\n"
-        "- Penjamin (golden retriever)\n"
-        "\n"
-        "### Network\n"
-        "\n"
-        "- [[Kevin Rudd]] (manager)\n"
-        "- [[Julia Gillard]] (ex-lover)\n"
-        "\n"
-        "## Conversations and Events\n"
-        "\n"
-        "### [[2024-12-10]]\n"
-        "\n"
-        "- Went for a river cruise with John and [[Jane Doe]]\n"
-        "- Discussed their new dog Penjamin, which they picked up on [[2024-12-05]]\n"
-        "- Crashed boat\n"
-        "\n"
-        "### [[2024-08-28]]\n"
-        "\n"
-        "- Went for dinner with John at Burger King\n"
-        "- Discussed his recent breakup with [[Julia Gillard]]\n"
-        "\n"
-        "## Notes\n"
-        "\n"
-        "- Kevin barracks for the Geelong football club\n"
-        "- Kevin's favourite ice-cream flavour is mint choc-chip\n"
-        "\n"
-        "## Gifts\n"
-        "\n"
-        "**Gift ideas:**\n"
-        "- Voucher for trapeze class\n"
-        "- How to Make Friends and Influence People (book)\n"
-        "\n"
-        "**Gifts given:**\n"
-        "- Jimbob (goldfish)\n"
-        "- Lego set of the Eiffel tower\n"
-        "\n"
-        "## Tasks\n"
-        "\n"
-        "- [x] Buy Eiffel tower lego set for John\n"
-        "- [x] Book river cruise\n"
-        "- [ ] Pay insurance claim for crashed river cruise\n"
-    )
-
-    user_instruction = (
-        f"Content to insert into {filename}'s CRM contact:\n\n" + user_instruction
-    )
-
-    # Create a new OpenAI client instance
-    client = OpenAI(api_key=openai_api_key)
+    with span("read"):
+        version = note_version(file_path)
+        base_content = file_path.read_text(encoding="utf-8")
+
+    with span("crm.fast_path"):
+        original_content, user_instruction = apply_fast_path(
+            base_content, user_instruction
+        )
+    if not user_instruction:
+        _write(file_path, base_content, original_content, version)
+        return
+    if not openai_api_key:
+        print("Error: No OpenAI API key found in config.")
+        sys.exit(1)
+
+    # Imported here so that fast path edits never load the OpenAI SDK
+    from obs.llm import chat_completion, get_client
+
+    # Reuse the process-wide OpenAI client and its connection pool
+    client = get_client(openai_api_key)
+
+    tokens = estimate_tokens(len(original_content))
+    if tokens > CONTEXT_TOKENS:
+        print(f"Error: '{file_path}' is too large to send to GPT-4o.")
+        sys.exit(1)
+    budget = insert_budget()
+    too_large = tokens > budget
+    if not edits:
+        # Contacts follow PERSON_TEMPLATE, so information usually fits one `##` block
+        sections = parse_sections(original_content)
+        target = select_section(
+            original_content,
+            [s for s in sections if s.level == 2],
+            user_instruction,
+            keywords=CRM_SECTION_KEYWORDS,
+        )
+        if target is not None and estimate_tokens(target.end - target.start) <= budget:
+            new_content = _insert_section_crm(
+                client,
+                original_content,
+                sections,
+                target,
+                filename,
+                user_instruction,
+            )
+            if new_content is not None:
+                _write(file_path, base_content, new_content, version)
+                return
+
+    if edits or too_large:
+        new_content = _insert_edits_crm(
+            client, original_content, filename, user_instruction
+        )
+        if new_content is not None:
+            _write(file_path, base_content, new_content, version)
+            return
+    if too_large:
+        print(f"Error: '{file_path}' is too large to insert into whole.")
+        sys.exit(1)
+
+    try:
+        new_content = chat_completion(
+            client,
+            model="gpt-4o",
+            messages=crm_messages(original_content, filename, user_instruction),
+            temperature=0.5,
+        )
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        sys.exit(1)
+
+    _write(file_path, base_content, new_content, version)
+
+
+def _insert_section_crm(
+    client: "OpenAI",
+    original_content: str,
+    sections: list[Section],
+    target: Section,
+    filename: str,
+    user_instruction: str,
+) -> str | None:
+    """
+    Send only the target `##` section plus a heading outline to GPT-4o and
+    splice the returned section back into the contact.
+
+    Returns None if the response can't be spliced back in safely.
+    """
+    from obs.llm import chat_completion
 
     try:
-        completion = client.chat.completions.create(
+        new_section = chat_completion(
+            client,
             model="gpt-4o",
-            messages=[
-                {"role": "developer", "content": system_message},
-                {"role": "developer", "content": sample_crm_contact},
-                {"role": "user", "content": original_content},
-                {"role": "user", "content": user_instruction},
-            ],
+            messages=crm_section_messages(
+                original_content, sections, target, filename, user_instruction
+            ),
             temperature=0.5,
         )
-        new_content = completion.choices[0].message.content
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
         sys.exit(1)
 
+    new_content = splice_section(original_content, target, new_section)
+    if new_content is None:
+        print(
+            f"Warning: Could not splice section '{target.title}', "
+            "falling back to the full document."
+        )
+    return new_content
+
+
+def _insert_edits_crm(
+    client: "OpenAI",
+    original_content: str,
+    filename: str,
+    user_instruction: str,
+) -> str | None:
+    """
+    Ask GPT-4o for a list of edit operations and apply them to the contact.
+
+    Returns None if the edits can't be applied.
+    """
+    from obs.llm import chat_completion
+
     try:
-        file_path.write_text(new_content, encoding="utf-8")
+        response = chat_completion(
+            client,
+            model="gpt-4o",
+            messages=crm_edits_messages(original_content, filename, user_instruction),
+            temperature=0.5,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        sys.exit(1)
+
+    try:
+        return apply_edits(original_content, parse_edits(response))
+    except PatchError as e:
+        print(f"Warning: Could not apply edits ({e}), falling back to a full rewrite.")
+        return None
+
+
+def _write(
+    file_path: Path, base_content: str, new_content: str, version: tuple[int, int]
+):
+    try:
+        write_note(file_path, base_content, new_content, version)
         print(f"Inserted content and updated file at: {file_path}")
+    except MergeConflict as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error writing file '{file_path}': {e}")
         sys.exit(1)
@@ -0,0 +1,123 @@
+# obs/commands/cmd_insert_many.py
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from pathlib import Path
+
+from obs.capture import run_captured
+from obs.cli import run_action
+from obs.index import WIKILINK_RE
+from obs.llm import size_client
+from obs.resolve import find_mentions, find_notes
+
+# Links to daily notes, e.g. [[2024-05-01]], which are dates rather than people
+DATE_LINK_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def insert_many(
+    config: dict,
+    vault_code: str,
+    vault_path: Path,
+    text: str,
+    edits: bool = False,
+    use_cache: bool = True,
+    concurrency: int = 4,
+):
+    """
+    Insert text into every note it mentions, e.g. each contact in
+    "Had dinner with [[Jane Doe]] and Bob Smith".
+
+    Notes are mentioned by wikilink (ignoring case, as in Obsidian) or by
+    their exact name, in any folder. Linked contacts that don't exist yet are
+    created from the person template first (in the `C` vault only). Each
+    note is then updated as by `insert`, with its own backup and write, up to
+    `concurrency` at a time, and a summary is printed at the end.
+    """
+    linked, missing, named = mentioned_notes(vault_code, vault_path, text)
+    if not linked and not missing and not named:
+        print("Error: The text doesn't mention any notes, by link or by name.")
+        sys.exit(1)
+
+    if missing and vault_code.upper() != "C":
+        print(f"Error: Linked notes don't exist: {', '.join(missing)}.")
+        sys.exit(1)
+    for name in missing:
+        run_action(config, vault_code, "create", name, "")
+
+    size_client(config, concurrency)
+
+    def insert(name: str) -> tuple[str, int, str]:
+        exit_code, output = run_captured(
+            run_action,
+            config,
+            vault_code,
+            "insert",
+            name,
+            text,
+            edits=edits,
+            use_cache=use_cache,
+        )
+        return name, exit_code, output
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Each insert runs in a copy of this context, so it shares any trace
+        futures = [
+            pool.submit(copy_context().run, insert, name)
+            for name in missing + linked + named
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if result[1] != 0]
+    print(
+        f"Inserted into {len(results) - len(failed)} of {len(results)} notes "
+        f"in {elapsed:.1f}s:"
+    )
+    for name, exit_code, output in results:
+        label = f"{name} (created)" if name in missing else name
+        if exit_code == 0:
+            print(f"  ok     {label}")
+        else:
+            reason = output.splitlines()[-1] if output else f"exit code {exit_code}"
+            print(f"  error  {label}: {reason}")
+    if failed:
+        sys.exit(1)
+
+
+def mentioned_notes(
+    vault_code: str, vault_path: Path, text: str
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Find the notes mentioned in text, each in order of first mention: the
+    existing notes it links to, the links to notes that don't exist yet, and
+    the existing notes it names without linking (see resolve.find_mentions).
+    Existing notes are returned by path. Links to daily notes are ignored.
+    """
+    links = []
+    for match in WIKILINK_RE.finditer(text):
+        name = match.group(1).strip()
+        if name and name not in links and not DATE_LINK_RE.fullmatch(name):
+            links.append(name)
+    found = find_notes(vault_code, vault_path, links)
+
+    linked, missing = [], []
+    for name in links:
+        if name not in found:
+            # New notes are created by name, at the top of the vault
+            name = name.rsplit("/", 1)[-1]
+            if name.casefold() not in map(str.casefold, missing):
+                missing.append(name)
+        elif found[name] not in linked:
+            linked.append(found[name])
+
+    # Only look for names outside links, which were handled above
+    unlinked = WIKILINK_RE.sub(" ", text)
+    named = [
+        path
+        for path in find_mentions(vault_code, vault_path, unlinked)
+        if path not in linked
+    ]
+    return linked, missing, named
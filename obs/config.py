@@ -1,29 +1,99 @@
 # obs/config.py
+import json
+import os
 import sys
 from pathlib import Path
 
-import yaml
+CONFIG_PATH = Path(
+    os.environ.get("OBS_CONFIG", Path.home() / ".obs_config.yaml")
+).expanduser()
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")).expanduser() / "obs"
+)
+CONFIG_SNAPSHOT_PATH = CACHE_DIR / "config.json"
+SOCKET_PATH = Path(os.environ.get("OBS_SOCKET", CACHE_DIR / "obsd.sock")).expanduser()
 
-CONFIG_PATH = Path.home() / ".obs_config.yaml"
+# The most recently loaded config in this process, keyed like the snapshot
+_loaded: tuple[list, dict] | None = None
 
 
 def load_config() -> dict:
     """
-    Loads config from ~/.obs_config.yaml.
+    Loads config from ~/.obs_config.yaml (or the path in $OBS_CONFIG).
     Expects structure:
       vaults:
         P: /path/to/personal/vault
         W: /path/to/work/vault
       openai_api_key: "sk-xxxxx"
       backup_dir: /path/to/backups
+
+    The validated config is snapshotted as JSON in the cache directory, and
+    the snapshot is used instead of re-parsing the YAML for as long as the
+    config file's mtime and size are unchanged. Long-lived processes also keep
+    the config in memory on the same terms.
     """
-    if not CONFIG_PATH.exists():
+    global _loaded
+
+    try:
+        stat = CONFIG_PATH.stat()
+    except FileNotFoundError:
         print(f"Error: Config file not found at {CONFIG_PATH}")
         sys.exit(1)
+    key = [str(CONFIG_PATH), stat.st_mtime_ns, stat.st_size]
+    if _loaded is not None and _loaded[0] == key:
+        return _loaded[1]
+
+    try:
+        snapshot = json.loads(CONFIG_SNAPSHOT_PATH.read_text(encoding="utf-8"))
+        if snapshot["key"] == key:
+            _loaded = (key, snapshot["config"])
+            return snapshot["config"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
     try:
+        import yaml
+
         with open(CONFIG_PATH, "r") as f:
             config = yaml.safe_load(f)
-        return config
     except Exception as e:
         print(f"Error loading config: {e}")
         sys.exit(1)
+
+    validate_config(config)
+    _write_snapshot(key, config)
+    _loaded = (key, config)
+    return config
+
+
+def validate_config(config) -> None:
+    """
+    Check the overall shape of the config, exiting with an error if it's wrong.
+    Missing keys are left for the commands that need them to report.
+    """
+    if not isinstance(config, dict):
+        print(f"Error: Config file {CONFIG_PATH} must contain a YAML mapping.")
+        sys.exit(1)
+    vaults = config.get("vaults", {})
+    if not isinstance(vaults, dict) or not all(
+        isinstance(path, str) for path in vaults.values()
+    ):
+        print("Error: 'vaults' in config must map vault codes to paths.")
+        sys.exit(1)
+
+
+def _write_snapshot(key: list, config: dict) -> None:
+    """
+    Atomically write the config snapshot, readable only by the current user
+    as it contains the API key. Failing to write it is not an error.
+    """
+    tmp_path = CONFIG_SNAPSHOT_PATH.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "config": config}, f)
+        os.replace(tmp_path, CONFIG_SNAPSHOT_PATH)
+    except (OSError, TypeError, ValueError):
+        # e.g. YAML values like dates that JSON can't represent
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,226 @@
+# obs/contacts.py
+import csv
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from obs.crm import add_list_field, add_to_section, set_inline_field
+
+# Characters Obsidian doesn't allow in note names
+UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|#^\[\]]')
+
+# CSV column names (lower case, letters and digits only) for each field, as
+# exported by Google Contacts, Outlook and most address books
+CSV_COLUMNS = {
+    "name": ["name", "fullname", "displayname", "contact"],
+    "first_name": ["firstname", "givenname"],
+    "last_name": ["lastname", "familyname", "surname"],
+    "email": ["email", "emailaddress", "email1value", "emailaddress1", "mail"],
+    "phone": [
+        "phone",
+        "phonenumber",
+        "mobile",
+        "mobilephone",
+        "cell",
+        "phone1value",
+        "primaryphone",
+    ],
+    "birthday": ["birthday", "birthdate", "dateofbirth", "dob"],
+    "address": ["address", "homeaddress", "address1formatted", "streetaddress"],
+    "company": [
+        "company",
+        "organisation",
+        "organization",
+        "employer",
+        "organization1name",
+    ],
+    # Outlook's "Title" is Mr/Ms, so it is only used if nothing better exists
+    "role": ["role", "jobtitle", "organization1title", "position", "title"],
+    "notes": ["notes", "note"],
+}
+
+
+@dataclass
+class Contact:
+    """
+    A contact read from an address book export, with any missing details
+    left blank.
+    """
+
+    name: str
+    email: str = ""
+    phone: str = ""
+    birthday: str = ""
+    address: str = ""
+    company: str = ""
+    role: str = ""
+    notes: str = ""
+
+    @property
+    def filename(self) -> str:
+        """The contact's note name, without characters notes can't have."""
+        return " ".join(UNSAFE_NAME_RE.sub("", self.name).split())
+
+
+def read_contacts(path: Path) -> Iterator[Contact]:
+    """
+    Stream contacts from a CSV file with a header row, or a vCard (.vcf)
+    file, one at a time.
+    """
+    if path.suffix.lower() in (".vcf", ".vcard"):
+        return read_vcards(path)
+    return read_csv(path)
+
+
+def read_csv(path: Path) -> Iterator[Contact]:
+    """
+    Stream contacts from a CSV file, matching its columns to contact fields by
+    name (see CSV_COLUMNS). Rows without a name are skipped.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = _match_columns(header)
+        for row in reader:
+            values = {
+                field: row[index].strip()
+                for field, index in columns.items()
+                if index < len(row)
+            }
+            name = values.pop("name", "") or " ".join(
+                filter(None, (values.get("first_name"), values.get("last_name")))
+            )
+            values.pop("first_name", None)
+            values.pop("last_name", None)
+            if name:
+                yield Contact(name=name, **values)
+
+
+def read_vcards(path: Path) -> Iterator[Contact]:
+    """
+    Stream contacts from a vCard file, taking the first value of each
+    property. Cards without a name are skipped.
+    """
+    card = None
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in _unfold(f):
+            name, _, value = line.partition(":")
+            # Drop any group prefix (item1.EMAIL) and parameters (EMAIL;TYPE=x)
+            prop = name.split(";", 1)[0].rsplit(".", 1)[-1].upper()
+            if prop == "BEGIN" and value.strip().upper() == "VCARD":
+                card = {}
+            elif prop == "END" and card is not None:
+                contact = _vcard_contact(card)
+                if contact is not None:
+                    yield contact
+                card = None
+            elif card is not None and prop not in card:
+                card[prop] = value
+
+
+def fill_contact(content: str, contact: Contact) -> str:
+    """
+    Fill the contact's details into a note following PERSON_TEMPLATE. Details
+    that already hold a different value, or whose field is missing, are left
+    alone. Details on several lines, such as a formatted address, are joined
+    into one, as each field is a single bullet.
+    """
+    inline = [
+        ("Email", contact.email),
+        ("Phone Number", contact.phone),
+        ("Address", contact.address),
+        ("Birthday", contact.birthday),
+    ]
+    for label, value in inline:
+        value = _one_line(value)
+        if value:
+            content = set_inline_field(content, label, value) or content
+    company = UNSAFE_NAME_RE.sub("", _one_line(contact.company)).strip()
+    if company:
+        content = (
+            add_list_field(content, "Company/organisation", f"[[{company}]]")
+            or content
+        )
+    role = _one_line(contact.role)
+    if role:
+        content = add_list_field(content, "Role", role) or content
+    # Notes are only added once, so merging the same import again changes nothing
+    for line in contact.notes.splitlines():
+        bullet = f"- {line.strip()}"
+        if line.strip() and bullet not in content.splitlines():
+            content = add_to_section(content, "Notes", bullet) or content
+    return content
+
+
+def _one_line(value: str) -> str:
+    """Join the non-blank lines of a value with commas."""
+    return ", ".join(filter(None, (line.strip() for line in value.splitlines())))
+
+
+def _match_columns(header: list[str]) -> dict[str, int]:
+    """
+    Map contact fields to the index of the first CSV column that holds them.
+    """
+    normalised = [re.sub(r"[^a-z0-9]", "", column.lower()) for column in header]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in normalised:
+                columns[field] = normalised.index(name)
+                break
+    return columns
+
+
+def _unfold(lines) -> Iterator[str]:
+    """
+    Join vCard lines continued on the next line (which starts with a space or
+    tab), yielding whole logical lines.
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _vcard_contact(card: dict[str, str]) -> Contact | None:
+    name = _unescape(card.get("FN", ""))
+    if not name and "N" in card:
+        # N is Family;Given;Additional;Prefix;Suffix
+        parts = [_unescape(part) for part in _split(card["N"])]
+        name = " ".join(filter(None, parts[1:2] + parts[:1]))
+    if not name:
+        return None
+
+    # ADR is PO box;Extended;Street;Locality;Region;Postal code;Country
+    address = ", ".join(filter(None, map(_unescape, _split(card.get("ADR", "")))))
+    return Contact(
+        name=name,
+        email=_unescape(card.get("EMAIL", "")),
+        phone=_unescape(card.get("TEL", "")).removeprefix("tel:"),
+        birthday=_unescape(card.get("BDAY", "")),
+        address=address,
+        company=_unescape(_split(card.get("ORG", ""))[0]),
+        role=_unescape(card.get("TITLE", "")),
+        notes=_unescape(card.get("NOTE", "")),
+    )
+
+
+def _split(value: str) -> list[str]:
+    """Split a structured vCard value on unescaped semicolons."""
+    return re.split(r"(?<!\\);", value)
+
+
+def _unescape(value: str) -> str:
+    return re.sub(
+        r"\\(.)", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value
+    ).strip()
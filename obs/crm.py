@@ -0,0 +1,319 @@
+# obs/crm.py
+import re
+from datetime import date, timedelta
+
+from obs.markdown import Section, parse_sections
+
+# Contacts follow PERSON_TEMPLATE (see cmd_create_person.py), where details are
+# either written on the same line as their label,
+#
+#     - **Email:** jdoe@gmail.com
+#
+# or as tab-indented sub-bullets under it,
+#
+#     - **Company/organisation:**
+#     	- [[Coca Cola]]
+
+EVENTS_SECTION = "Conversations and Events"
+TASKS_SECTION = "Tasks"
+
+_EMAIL = r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+_ARTICLE = r"(?:(?:his|her|their|the)\s+)?"
+
+EMAIL_RE = re.compile(
+    rf"(?:{_ARTICLE}e-?mail(?:\s+address)?(?:\s+is|:)?\s+)?({_EMAIL})", re.I
+)
+PHONE_RE = re.compile(
+    rf"{_ARTICLE}(?:phone|mobile|cell)(?:\s+number)?(?:\s+is|:)?\s+"
+    r"(\+?[\d\s()-]{6,})",
+    re.I,
+)
+BIRTHDAY_RE = re.compile(
+    rf"(?:{_ARTICLE}birthday(?:\s+is|:)?|born\s+on)\s+(.+)", re.I
+)
+ADDRESS_RE = re.compile(rf"(?:lives\s+at|{_ARTICLE}address(?:\s+is|:))\s+(.+)", re.I)
+COMPANY_RE = re.compile(
+    r"(?:works|working)\s+(?:at|for)\s+(.+?)(?:\s+as\s+(?:an?\s+)?(.+))?", re.I
+)
+ROLE_AT_RE = re.compile(
+    r"works\s+as\s+(?:an?\s+)?(.+?)\s+(?:at|for)\s+(.+)", re.I
+)
+ROLE_RE = re.compile(
+    rf"(?:works\s+as\s+(?:an?\s+)?"
+    rf"|{_ARTICLE}(?:role|job\s+title|job)(?:\s+is|:)\s+)(.+)",
+    re.I,
+)
+EVENT_RE = re.compile(
+    r"(?:on\s+)?(?:(\d{4}-\d{2}-\d{2})\s*[:,-]?|(today|yesterday)\s*[:,-])\s*(.+)",
+    re.I,
+)
+TASK_RE = re.compile(r"(?:todo|to-do|task|remind\s+me\s+to)\s*:?\s+(.+)", re.I)
+
+# The free text captured above is only written in directly if it looks like
+# the value it should be; anything else ("works at home on Fridays") is left
+# for the model.
+LINK_RE = re.compile(r"\[\[[^\[\]|#]+\]\]")
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?"
+    r"|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+DATE_VALUE_RE = re.compile(
+    rf"\d{{4}}-\d{{1,2}}-\d{{1,2}}"
+    rf"|\d{{1,2}}[/.]\d{{1,2}}(?:[/.]\d{{2,4}})?"
+    rf"|{_DAY}(?:\s+of)?\s+{_MONTH}(?:,?\s+\d{{4}})?"
+    rf"|{_MONTH}\s+{_DAY}(?:,?\s+\d{{4}})?",
+    re.I,
+)
+# Lower case words allowed between the capitalised words of a name
+NAME_CONNECTORS = {"of", "and", "&", "de", "du", "la", "van", "von", "der"}
+# Words that start a phrase about when, where or how ("since 2020", "on
+# Fridays", "with her parents"), or are pronouns ("driving me crazy"),
+# rather than being part of a value
+PHRASE_WORDS = set(
+    (
+        "since until till from for during before after on in at with without "
+        "when while because but now currently today yesterday last next this "
+        "every each again i me my he him his she her they them their it its "
+        "we us our you your"
+    ).split()
+)
+MAX_VALUE_WORDS = 6
+VALUE_WORD_RE = re.compile(r"[\w&.'/-]+")
+
+
+def apply_fast_path(content: str, instruction: str) -> tuple[str, str]:
+    """
+    Apply the parts of an instruction that can be written into a contact
+    without the model: structured fields (email, phone, birthday, address,
+    company, role), dated events and tasks.
+
+    The instruction is split into clauses on newlines and semicolons. Each
+    clause must match a rule exactly, and its target must be unambiguous (e.g.
+    an email is only filled in if the field is empty); any other clause is
+    left for the model.
+
+    Returns the updated content and the remaining, unmatched instruction.
+    """
+    unmatched = []
+    for clause in re.split(r"[\n;]+", instruction):
+        clause = clause.strip().rstrip(".").strip()
+        if not clause:
+            continue
+        updated = _apply_clause(content, clause)
+        if updated is None:
+            unmatched.append(clause)
+        else:
+            content = updated
+    return content, "\n".join(unmatched)
+
+
+def _apply_clause(content: str, clause: str) -> str | None:
+    if match := EMAIL_RE.fullmatch(clause):
+        return set_inline_field(content, "Email", match.group(1))
+    if match := PHONE_RE.fullmatch(clause):
+        return set_inline_field(content, "Phone Number", match.group(1).strip())
+    if (match := BIRTHDAY_RE.fullmatch(clause)) and DATE_VALUE_RE.fullmatch(
+        match.group(1)
+    ):
+        return set_inline_field(content, "Birthday", match.group(1))
+    if (match := ADDRESS_RE.fullmatch(clause)) and _is_address(match.group(1)):
+        return set_inline_field(content, "Address", match.group(1))
+    if (
+        (match := COMPANY_RE.fullmatch(clause))
+        and _is_name(match.group(1))
+        and (match.group(2) is None or _is_role(match.group(2)))
+    ):
+        return _add_job(content, match.group(1), match.group(2))
+    if (
+        (match := ROLE_AT_RE.fullmatch(clause))
+        and _is_role(match.group(1))
+        and _is_name(match.group(2))
+    ):
+        return _add_job(content, match.group(2), match.group(1))
+    if (match := ROLE_RE.fullmatch(clause)) and _is_role(match.group(1)):
+        return add_list_field(content, "Role", _capitalise(match.group(1)))
+    if match := EVENT_RE.fullmatch(clause):
+        event_date = match.group(1) or _resolve_date(match.group(2))
+        return add_event(content, event_date, match.group(3))
+    if match := TASK_RE.fullmatch(clause):
+        task = f"- [ ] {_capitalise(match.group(1))}"
+        return add_to_section(content, TASKS_SECTION, task)
+    return None
+
+
+def _is_name(text: str) -> bool:
+    """
+    Whether text looks like the name of a company or person: a [[link]], or
+    a few capitalised words, with only connectors like "of" between them
+    (e.g. "Bank of America", but not "home on Fridays" or "Acme since 2020").
+    """
+    if LINK_RE.fullmatch(text):
+        return True
+    words = text.split()
+    if not words or len(words) > MAX_VALUE_WORDS:
+        return False
+    if words[0] in NAME_CONNECTORS or words[-1] in NAME_CONNECTORS:
+        return False
+    return all(
+        VALUE_WORD_RE.fullmatch(word)
+        and word.lower() not in PHRASE_WORDS
+        and (word[0].isupper() or word[0].isdigit() or word in NAME_CONNECTORS)
+        for word in words
+    )
+
+
+def _is_role(text: str) -> bool:
+    """
+    Whether text looks like a job title (e.g. "senior data scientist", "Head
+    of Sales"), without a phrase about when or where after it.
+    """
+    words = text.split()
+    return 0 < len(words) <= MAX_VALUE_WORDS and all(
+        VALUE_WORD_RE.fullmatch(word)
+        and not any(c.isdigit() for c in word)
+        and word.lower() not in PHRASE_WORDS
+        for word in words
+    )
+
+
+def _is_address(text: str) -> bool:
+    """
+    Whether text looks like a street address: it has a house number or
+    postcode, and no phrase about when or with whom after it.
+    """
+    words = text.replace(",", " ").split()
+    return any(c.isdigit() for c in text) and all(
+        VALUE_WORD_RE.fullmatch(word) and word.lower() not in PHRASE_WORDS
+        for word in words
+    )
+
+
+def _add_job(content: str, company: str, role: str | None) -> str | None:
+    if not company.startswith("[["):
+        company = f"[[{company}]]"
+    content = add_list_field(content, "Company/organisation", company)
+    if content is not None and role:
+        content = add_list_field(content, "Role", _capitalise(role))
+    return content
+
+
+def set_inline_field(content: str, label: str, value: str) -> str | None:
+    """
+    Fill in an inline field such as `- **Email:**`. Returns None if the field
+    is missing, or already holds a different value.
+    """
+    line_re = re.compile(rf"^- \*\*{re.escape(label)}:\*\*(.*)$", re.M)
+    matches = list(line_re.finditer(content))
+    if len(matches) != 1:
+        return None
+    existing = matches[0].group(1).strip()
+    if existing == value:
+        return content
+    if existing:
+        return None
+    start, end = matches[0].span()
+    return content[:start] + f"- **{label}:** {value}" + content[end:]
+
+
+def add_list_field(content: str, label: str, value: str) -> str | None:
+    """
+    Add a sub-bullet to a list field such as `- **Role:**`, after any existing
+    ones. Returns None if the field is missing.
+    """
+    line_re = re.compile(rf"^- \*\*{re.escape(label)}:\*\*[ \t]*\n?", re.M)
+    matches = list(line_re.finditer(content))
+    if len(matches) != 1:
+        return None
+
+    pos = matches[0].end()
+    if not content[:pos].endswith("\n"):
+        content += "\n"
+        pos += 1
+    # Skip over the existing sub-bullets
+    while match := re.compile(r"[ \t]+- (.*)\n?").match(content, pos):
+        if match.group(1).strip() == value:
+            return content
+        pos = match.end()
+        if not content[:pos].endswith("\n"):
+            content += "\n"
+            pos += 1
+    return content[:pos] + f"\t- {value}\n" + content[pos:]
+
+
+def add_to_section(content: str, title: str, line: str) -> str | None:
+    """
+    Add a line to the end of the `##` section with the given title. Returns
+    None if the contact has no such section.
+    """
+    section = _find_section(content, title, level=2)
+    if section is None:
+        return None
+    return _append_lines(content, section, line)
+
+
+def add_event(content: str, event_date: str, text: str) -> str | None:
+    """
+    Add a bullet under the `### [[date]]` heading in Conversations and Events,
+    creating the heading if needed so that dates stay newest first. Returns
+    None if the contact has no such section.
+    """
+    events = _find_section(content, EVENTS_SECTION, level=2)
+    if events is None:
+        return None
+    bullet = f"- {_capitalise(text)}"
+
+    dated = [
+        s
+        for s in parse_sections(content)
+        if s.level == 3 and events.start < s.start < events.end
+    ]
+    for section in dated:
+        if section.title.strip() == f"[[{event_date}]]":
+            return _append_lines(content, section, bullet)
+
+    new_block = f"### [[{event_date}]]\n\n{bullet}\n\n"
+    for section in dated:
+        # Titles look like [[YYYY-MM-DD]], so they sort as strings
+        if section.title.strip() < f"[[{event_date}]]":
+            return content[: section.start] + new_block + content[section.start :]
+    return _append_lines(content, events, new_block.rstrip("\n"))
+
+
+def _find_section(content: str, title: str, level: int) -> Section | None:
+    matches = [
+        s
+        for s in parse_sections(content)
+        if s.level == level and s.title.strip() == title
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _append_lines(content: str, section: Section, lines: str) -> str:
+    """
+    Append lines to the end of a section's content, keeping the section's
+    trailing blank lines before the next heading.
+    """
+    original = content[section.start : section.end]
+    body = original.rstrip()
+    trailing = original[len(body) :] or "\n"
+    if "\n" not in body:
+        # The section is only its heading, so separate it with a blank line
+        body += "\n"
+    if not trailing.startswith("\n\n") and section.end < len(content):
+        trailing = "\n\n"
+    before, after = content[: section.start], content[section.end :]
+    return before + body + "\n" + lines + trailing + after
+
+
+def _resolve_date(value: str) -> str:
+    match value.lower():
+        case "today":
+            return date.today().isoformat()
+        case "yesterday":
+            return (date.today() - timedelta(days=1)).isoformat()
+    return value
+
+
+def _capitalise(text: str) -> str:
+    return text[:1].upper() + text[1:]
@@ -0,0 +1,213 @@
+# obs/daemon.py
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+from obs.capture import capture_output
+from obs.config import SOCKET_PATH, load_config
+
+# Requests and responses are newline-delimited JSON. The client sends
+#   {"argv": [...], "env": {...}}
+# with the FORWARDED_ENV variables it has set, and the daemon replies with any
+# number of
+#   {"output": "..."}
+# lines as the command prints, followed by a final
+#   {"exit_code": N}
+
+# Environment variables that apply to a single command, and so are taken from
+# the client rather than the daemon. Paths are made absolute first, as the
+# daemon runs in a different directory. Everything else, such as OBS_CONFIG or
+# OPENAI_BASE_URL, is the daemon's.
+FORWARDED_ENV = ("OBS_TRACE_FILE",)
+
+
+def forward(args: list[str]) -> int | None:
+    """
+    Run a command in the `obs serve` daemon, printing its output as it arrives.
+    Returns the command's exit code, or None if the daemon isn't running and
+    the command should be run in this process instead.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(SOCKET_PATH))
+    except OSError:
+        sock.close()
+        return None
+
+    env = {
+        name: os.path.abspath(os.environ[name])
+        for name in FORWARDED_ENV
+        if os.environ.get(name)
+    }
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps({"argv": args, "env": env}).encode("utf-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "output" in message:
+                sys.stdout.write(message["output"])
+                sys.stdout.flush()
+            if "exit_code" in message:
+                return message["exit_code"]
+
+    print("Error: Lost connection to the obs daemon.")
+    return 1
+
+
+def serve(coalesce_window: float = 0):
+    """
+    Run the `obs serve` daemon: keep the config, the command modules and a
+    kept-alive OpenAI client loaded, and run commands forwarded over the Unix
+    socket at SOCKET_PATH. Each connection is handled in its own thread, and
+    edits to the same note are applied one at a time.
+
+    With a `coalesce_window` (in seconds), inserts into the same note that
+    arrive within the window of each other are combined into one (see
+    obs.coalesce).
+    """
+    if SOCKET_PATH.exists():
+        if _is_running():
+            print(f"Error: obs daemon is already running on '{SOCKET_PATH}'.")
+            sys.exit(1)
+        SOCKET_PATH.unlink()
+    SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # Pay for config parsing, imports and client construction once, up front
+    config = load_config()
+    import obs.backup  # noqa: F401
+    import obs.commands.cmd_append  # noqa: F401
+    import obs.commands.cmd_insert  # noqa: F401
+    import obs.commands.cmd_insert_crm  # noqa: F401
+    from obs.llm import get_client
+
+    if config.get("openai_api_key"):
+        get_client(config["openai_api_key"])
+
+    with socketserver.ThreadingUnixStreamServer(str(SOCKET_PATH), _Handler) as server:
+        os.chmod(SOCKET_PATH, 0o600)
+        server.daemon_threads = True
+        server.coalescer = None
+        if coalesce_window > 0:
+            from obs.coalesce import Coalescer
+
+            server.coalescer = Coalescer(coalesce_window, _run_coalesced)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f"obs daemon listening on '{SOCKET_PATH}'")
+        if server.coalescer is not None:
+            print(f"Combining inserts into the same note within {coalesce_window}s")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            SOCKET_PATH.unlink(missing_ok=True)
+
+
+def _run(args: list[str], env: dict | None = None) -> int:
+    """
+    Run a command in this thread, with the client's FORWARDED_ENV variables,
+    returning its exit code.
+    """
+    from obs.cli import run_args
+
+    try:
+        run_args(args, env=env or {})
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+def _run_coalesced(key, instructions: list[str]) -> tuple[int, str]:
+    """
+    Run one insert for a group of coalesced instructions, returning its exit
+    code and output to pass back to every caller in the group.
+    """
+    from obs.coalesce import insert_args
+    from obs.markdown import scope_sections
+
+    # Combined instructions may belong in different sections of the note
+    token = scope_sections.set(len(instructions) == 1)
+    try:
+        with capture_output() as output:
+            if len(instructions) > 1:
+                print(
+                    f"Combined {len(instructions)} instructions for '{key[1]}' "
+                    "into one insert."
+                )
+            exit_code = _run(insert_args(key, instructions))
+    finally:
+        scope_sections.reset(token)
+    return exit_code, output.getvalue()
+
+
+def _is_running() -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(SOCKET_PATH))
+            return True
+        except OSError:
+            return False
+
+
+class _ResponseWriter:
+    """
+    File-like object that sends everything written to it back to the client.
+    If the client has gone away the command still runs to completion.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, s: str) -> int:
+        if s:
+            self.send({"output": s})
+        return len(s)
+
+    def flush(self):
+        pass
+
+    def send(self, message: dict):
+        try:
+            self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        except OSError:
+            pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        writer = _ResponseWriter(self.wfile)
+        try:
+            request = json.loads(self.rfile.readline())
+            args = request["argv"]
+            env = {
+                name: value
+                for name, value in request.get("env", {}).items()
+                if name in FORWARDED_ENV
+            }
+        except (ValueError, KeyError, TypeError, AttributeError):
+            writer.write("Error: Invalid request.\n")
+            writer.send({"exit_code": 1})
+            return
+
+        # Traced commands are run on their own, so that each gets its own trace
+        coalescer = self.server.coalescer
+        if coalescer is not None and not env:
+            from obs.coalesce import insert_key
+
+            request = insert_key(args)
+            if request is not None:
+                exit_code, output = coalescer.submit(*request)
+                writer.write(output)
+                writer.send({"exit_code": exit_code})
+                return
+
+        with capture_output(writer):
+            exit_code = _run(args, env)
+        writer.send({"exit_code": exit_code})
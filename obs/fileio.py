@@ -0,0 +1,100 @@
+# obs/fileio.py
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from obs.trace import span
+
+
+class NoteChanged(Exception):
+    """The note changed on disk since the version a write was based on."""
+
+
+def note_version(file_path: Path) -> tuple[int, int]:
+    """
+    A cheap fingerprint of a note on disk, its modification time and size, to
+    take before reading it and check again before replacing it.
+    """
+    stat = file_path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+@contextmanager
+def atomic_writer(
+    file_path: Path, binary: bool = False, expect: tuple[int, int] | None = None
+):
+    """
+    Open a temporary file next to file_path for writing text (or bytes, with
+    `binary`). When the block exits cleanly the temporary file is flushed to
+    disk and atomically renamed over file_path; if the block raises, it is
+    deleted and file_path is left untouched.
+
+    With `expect` (from note_version), NoteChanged is raised instead of
+    replacing file_path if it has changed since.
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+    )
+    tmp_path = Path(tmp_name)
+    try:
+        f = os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")
+        with f:
+            yield f
+            with span("write.fsync"):
+                f.flush()
+                os.fsync(f.fileno())
+        if file_path.exists():
+            shutil.copymode(file_path, tmp_path)
+        if expect is not None and note_version(file_path) != expect:
+            raise NoteChanged(f"'{file_path}' changed while it was being edited")
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(
+    file_path: Path, content: str, expect: tuple[int, int] | None = None
+) -> None:
+    """
+    Replace file_path with content atomically, so readers (and hardlinked
+    backup snapshots) never see a partially written note.
+    """
+    with span("write"), atomic_writer(file_path, expect=expect) as f:
+        f.write(content)
+
+
+def append_text(file_path: Path, text: str, attempts: int = 5) -> None:
+    """
+    Atomically append text to file_path, starting again from the current note
+    if it changes while being copied.
+    """
+    for attempt in range(attempts):
+        try:
+            with span("write"), atomic_appender(file_path) as f:
+                f.write(text)
+            return
+        except NoteChanged:
+            if attempt == attempts - 1:
+                raise
+
+
+@contextmanager
+def atomic_appender(file_path: Path):
+    """
+    Like atomic_writer, but the temporary file starts out as a copy of
+    file_path, so text written to it is appended to the note without reading
+    the note into memory. Raises NoteChanged, leaving the note untouched, if
+    it changes between being copied and being replaced.
+    """
+    version = note_version(file_path)
+    with atomic_writer(file_path, binary=True, expect=version) as f:
+        with span("write.copy"), open(file_path, "rb") as src:
+            shutil.copyfileobj(src, f, 1024 * 1024)
+        text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        yield text
+        text.flush()
+        text.detach()
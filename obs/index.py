@@ -0,0 +1,215 @@
+# obs/index.py
+import os
+import re
+import sqlite3
+from pathlib import Path
+from urllib.parse import quote
+
+from obs.config import CACHE_DIR
+from obs.markdown import parse_sections
+
+INDEX_DIR = CACHE_DIR / "index"
+
+# [[Target]], [[Target#Heading]], [[Target|Alias]] and ![[Embeds]]
+WIKILINK_RE = re.compile(r"\[\[([^\]|#]*)(?:#[^\]|]*)?(?:\|[^\]]*)?\]\]")
+ALIASES_RE = re.compile(r"^(aliases|alias):[ \t]*(.*)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (path TEXT NOT NULL, alias TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS headings (
+    path TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (path TEXT NOT NULL, target TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS notes_name ON notes (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS aliases_path ON aliases (path);
+CREATE INDEX IF NOT EXISTS headings_path ON headings (path);
+CREATE INDEX IF NOT EXISTS links_path ON links (path);
+CREATE INDEX IF NOT EXISTS links_target ON links (target COLLATE NOCASE);
+"""
+
+
+def open_index(vault_code: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) the index database for a vault.
+
+    Notes are keyed by their path relative to the vault without the .md
+    extension, i.e. the filename obs commands take.
+    """
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDEX_DIR / f"{quote(vault_code, safe='')}.sqlite")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def update_index(conn: sqlite3.Connection, vault_path: Path) -> dict:
+    """
+    Bring the index up to date with the vault on disk. Only notes whose mtime
+    or size changed since they were last indexed are read and parsed, and
+    notes that no longer exist are removed. Returns counts of what was done.
+    """
+    indexed = {
+        path: (mtime_ns, size)
+        for path, mtime_ns, size in conn.execute(
+            "SELECT path, mtime_ns, size FROM notes"
+        )
+    }
+    stats = {"notes": 0, "updated": 0, "removed": 0}
+
+    with conn:
+        for path, stat in _walk_notes(vault_path):
+            stats["notes"] += 1
+            if indexed.pop(path, None) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            try:
+                text = (vault_path / f"{path}.md").read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            _delete_note(conn, path)
+            _insert_note(conn, path, stat, text)
+            stats["updated"] += 1
+
+        for path in indexed:
+            _delete_note(conn, path)
+            stats["removed"] += 1
+
+    return stats
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 20) -> list[tuple]:
+    """
+    Find notes whose name, alias or headings contain query (case-insensitive).
+    Returns (path, reason) pairs, best matches first: exact names, then name
+    prefixes, names, aliases and finally headings.
+    """
+    pattern = f"%{_escape_like(query)}%"
+    prefix = f"{_escape_like(query)}%"
+    rows = conn.execute(
+        """
+        SELECT path, reason FROM (
+            SELECT path, 'name' AS reason,
+                CASE WHEN name = :query COLLATE NOCASE THEN 0
+                     WHEN name LIKE :prefix ESCAPE '\\' THEN 1
+                     ELSE 2 END AS rank
+            FROM notes WHERE name LIKE :pattern ESCAPE '\\'
+            UNION ALL
+            SELECT path, 'alias: ' || alias, 3 FROM aliases
+            WHERE alias LIKE :pattern ESCAPE '\\'
+            UNION ALL
+            SELECT path, 'heading: ' || title, 4 FROM headings
+            WHERE title LIKE :pattern ESCAPE '\\'
+        )
+        ORDER BY rank, length(path), path
+        """,
+        {"query": query, "prefix": prefix, "pattern": pattern},
+    )
+
+    results = []
+    seen = set()
+    for path, reason in rows:
+        if path not in seen:
+            seen.add(path)
+            results.append((path, reason))
+            if len(results) == limit:
+                break
+    return results
+
+
+def backlinks(conn: sqlite3.Connection, filename: str) -> list[str]:
+    """
+    Return the notes that link to the given note, by name or by path.
+    """
+    name = filename.rsplit("/", 1)[-1]
+    rows = conn.execute(
+        "SELECT DISTINCT path FROM links "
+        "WHERE target = ? COLLATE NOCASE OR target = ? COLLATE NOCASE ORDER BY path",
+        (name, filename),
+    )
+    return [path for (path,) in rows]
+
+
+def _walk_notes(vault_path: Path):
+    """
+    Yield (path, stat) for every note in the vault, skipping hidden folders
+    such as .obsidian and .trash.
+    """
+    stack = [vault_path]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.name.endswith(".md"):
+                relative = Path(entry.path).relative_to(vault_path).as_posix()
+                yield relative[: -len(".md")], entry.stat()
+
+
+def _insert_note(conn: sqlite3.Connection, path: str, stat, text: str) -> None:
+    conn.execute(
+        "INSERT INTO notes (path, name, mtime_ns, size) VALUES (?, ?, ?, ?)",
+        (path, path.rsplit("/", 1)[-1], stat.st_mtime_ns, stat.st_size),
+    )
+    conn.executemany(
+        "INSERT INTO aliases (path, alias) VALUES (?, ?)",
+        [(path, alias) for alias in _front_matter_aliases(text)],
+    )
+    conn.executemany(
+        "INSERT INTO headings (path, level, title, position) VALUES (?, ?, ?, ?)",
+        [(path, s.level, s.title, s.start) for s in parse_sections(text)],
+    )
+    targets = {m.group(1).strip() for m in WIKILINK_RE.finditer(text)}
+    conn.executemany(
+        "INSERT INTO links (path, target) VALUES (?, ?)",
+        [(path, target) for target in targets if target],
+    )
+
+
+def _delete_note(conn: sqlite3.Connection, path: str) -> None:
+    for table in ("notes", "aliases", "headings", "links"):
+        conn.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+
+def _front_matter_aliases(text: str) -> list[str]:
+    """
+    Read `aliases` from YAML front matter, in either the inline list form
+    (aliases: [A, B]) or the block list form, without a full YAML parser.
+    """
+    if not text.startswith("---\n"):
+        return []
+    end = text.find("\n---", 4)
+    if end == -1:
+        return []
+
+    aliases = []
+    in_aliases = False
+    for line in text[4:end].splitlines():
+        match = ALIASES_RE.match(line)
+        if match:
+            value = match.group(2).strip()
+            in_aliases = not value
+            aliases.extend(value.strip("[]").split(",") if value else [])
+        elif in_aliases and line.lstrip().startswith("- "):
+            aliases.append(line.lstrip()[2:])
+        else:
+            in_aliases = False
+
+    return [a.strip().strip("\"'") for a in aliases if a.strip().strip("\"'")]
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
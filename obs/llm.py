@@ -0,0 +1,151 @@
+# obs/llm.py
+import threading
+import time
+from collections.abc import Iterator
+from itertools import chain
+
+from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI
+
+from obs.cache import cache_key, get_response, put_response
+from obs.retry import call_with_retries
+from obs.trace import span
+from obs.usage import record_usage
+
+_clients: dict[str, OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str, max_connections: int = 10) -> OpenAI:
+    """
+    Return the OpenAI client for api_key, creating it on first use.
+
+    Every command in the process shares the same client, and so the same
+    pool of kept-alive HTTP connections. `max_connections` only takes effect
+    when the client is first created.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            # Built from the SDK's own defaults, so it's of whichever HTTP
+            # library the installed openai package uses
+            limits = type(DEFAULT_CONNECTION_LIMITS)(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+            client = OpenAI(
+                api_key=api_key, http_client=DefaultHttpxClient(limits=limits)
+            )
+            _clients[api_key] = client
+        return client
+
+
+def size_client(config: dict, concurrency: int) -> None:
+    """
+    Size the shared client's connection pool for `concurrency` commands at
+    once. Call it before running them, as the first command to use the client
+    creates it. Does nothing if the config has no API key.
+    """
+    if config.get("openai_api_key"):
+        get_client(config["openai_api_key"], max_connections=concurrency)
+
+
+def chat_completion(
+    client: OpenAI, model: str, messages: list[dict], temperature: float, **kwargs
+) -> str:
+    """
+    Return the content of a chat completion, served from the response cache
+    when an identical request has been made before. API calls are made under
+    the current request policy (see retry.RequestPolicy) and recorded in the
+    usage log.
+    """
+    key = cache_key(model, temperature, messages, **kwargs)
+    content = get_response(key)
+    if content is None:
+        start = time.perf_counter()
+        with span("api", model=model):
+            completion = call_with_retries(
+                lambda timeout: client.with_options(
+                    timeout=timeout, max_retries=0
+                ).chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, **kwargs
+                )
+            )
+        record_usage(model, completion.usage, time.perf_counter() - start)
+        choice = completion.choices[0]
+        # A reply cut off at the output limit would be written over the note
+        if choice.finish_reason == "length":
+            raise RuntimeError("the response was cut off at the model's output limit")
+        content = choice.message.content
+        put_response(key, content)
+    return content
+
+
+def stream_chat_completion(
+    client: OpenAI, model: str, messages: list[dict], temperature: float, **kwargs
+) -> Iterator[str]:
+    """
+    Yield the content of a chat completion as it is generated. A cached
+    response is yielded in one piece, and a streamed response is only cached
+    once it has finished. Streamed API calls are recorded in the usage log
+    along with the time to the first token.
+
+    Retries and hedging (see retry.RequestPolicy) apply until the first token
+    arrives; after that, an error ends the stream.
+    """
+    key = cache_key(model, temperature, messages, **kwargs)
+    content = get_response(key)
+    if content is not None:
+        yield content
+        return
+
+    deltas = []
+    usage = first_token_seconds = None
+    start = time.perf_counter()
+    with span("api.stream", model=model) as api_span:
+        completion, first_chunks = call_with_retries(
+            lambda timeout: _open_stream(
+                client,
+                timeout,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                # The final chunk then carries the token counts, with no choices
+                stream_options={"include_usage": True},
+                **kwargs,
+            ),
+            discard=lambda opened: opened[0].close(),
+            stream=True,
+        )
+        for chunk in chain(first_chunks, completion):
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                    api_span.attrs["first_token_ms"] = round(
+                        first_token_seconds * 1000, 1
+                    )
+                deltas.append(delta)
+                yield delta
+    record_usage(model, usage, time.perf_counter() - start, first_token_seconds)
+    put_response(key, "".join(deltas))
+
+
+def _open_stream(client: OpenAI, timeout: float, **request) -> tuple[Iterator, list]:
+    """
+    Start a streamed completion and read it up to the first chunk with
+    content, so that a stream which stalls before producing anything counts
+    as a failed (or slow, for hedging) attempt. Returns the stream and the
+    chunks read so far.
+    """
+    stream = client.with_options(
+        timeout=timeout, max_retries=0
+    ).chat.completions.create(**request)
+    first_chunks = []
+    for chunk in stream:
+        first_chunks.append(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            break
+    return stream, first_chunks
@@ -0,0 +1,16 @@
+# obs/locks.py
+import threading
+from pathlib import Path
+
+_note_locks: dict[Path, threading.Lock] = {}
+_note_locks_guard = threading.Lock()
+
+
+def note_lock(vault_path: Path, filename: str) -> threading.Lock:
+    """
+    Return the lock for a note, shared by every thread in the process, so that
+    edits to the same note are applied one at a time.
+    """
+    file_path = (vault_path / f"{filename}.md").resolve()
+    with _note_locks_guard:
+        return _note_locks.setdefault(file_path, threading.Lock())
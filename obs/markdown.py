@@ -0,0 +1,211 @@
+# obs/markdown.py
+import re
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import BinaryIO
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t]*#*[ \t]*$")
+FENCE_RE = re.compile(r"^[ \t]{0,3}(```|~~~)")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Sections covering more than this fraction of the note are not worth scoping.
+MAX_SECTION_FRACTION = 0.75
+
+# Cleared for an insert carrying several coalesced instructions (see
+# obs.coalesce), which may each belong in a different section
+scope_sections: ContextVar[bool] = ContextVar("scope_sections", default=True)
+
+
+@dataclass
+class Section:
+    """
+    A heading and everything beneath it, up to the next heading of the same
+    or a higher level. Offsets index into the original text.
+    """
+
+    level: int
+    title: str
+    heading: str
+    start: int
+    end: int
+
+
+def parse_sections(text: str) -> list[Section]:
+    """
+    Parse the ATX headings of a Markdown document into a flat list of sections,
+    in document order. Headings inside fenced code blocks and YAML front matter
+    are ignored.
+    """
+    return _parse_lines(text.splitlines(keepends=True))
+
+
+def scan_sections(f: BinaryIO) -> list[Section]:
+    """
+    Like parse_sections, but read a note opened in binary mode line by line
+    rather than holding it in memory. Offsets are byte offsets into the file.
+    """
+    return _parse_lines(f)
+
+
+def _parse_lines(lines: Iterable[str | bytes]) -> list[Section]:
+    sections = []
+    in_fence = False
+    in_front_matter = False
+    pos = 0
+
+    for index, line in enumerate(lines):
+        line_start = pos
+        pos += len(line)
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        stripped = line.rstrip("\r\n")
+
+        if index == 0 and stripped == "---":
+            in_front_matter = True
+            continue
+        if in_front_matter:
+            if stripped in ("---", "..."):
+                in_front_matter = False
+            continue
+        if FENCE_RE.match(stripped):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+
+        match = HEADING_RE.match(stripped)
+        if match:
+            sections.append(
+                Section(
+                    level=len(match.group(1)),
+                    title=match.group(2),
+                    heading=stripped,
+                    start=line_start,
+                    end=-1,
+                )
+            )
+
+    # Each section ends where the next heading of the same or higher level
+    # begins, or at the end of the document
+    for i, section in enumerate(sections):
+        section.end = pos
+        for following in sections[i + 1 :]:
+            if following.level <= section.level:
+                section.end = following.start
+                break
+
+    return sections
+
+
+def heading_outline(sections: list[Section], target: Section | None = None) -> str:
+    """
+    Render a compact outline of the document's headings, one per line,
+    marking the target section if given.
+    """
+    lines = []
+    for section in sections:
+        line = section.heading
+        if section is target:
+            line += "    <-- section being edited"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _words(text: str) -> set[str]:
+    return {word for word in WORD_RE.findall(text.lower()) if len(word) >= 3}
+
+
+def _matches(word: str, candidates: set[str]) -> bool:
+    return any(c.startswith(word) or word.startswith(c) for c in candidates)
+
+
+def score_sections(
+    sections: list[Section],
+    instruction: str,
+    keywords: dict[str, list[str]] | None = None,
+) -> list[tuple[int, Section]]:
+    """
+    Score sections by how many words of their title appear in the instruction.
+    If `keywords` is given (a mapping of section title to hint words), only
+    those sections are considered and they are scored by how many of their
+    hint words appear in the instruction instead.
+
+    Returns (score, section) pairs for the sections that scored at all.
+    """
+    instruction_words = _words(instruction)
+    scores = []
+
+    for section in sections:
+        if keywords is not None:
+            hints = keywords.get(section.title.strip())
+            if hints is None:
+                continue
+            score = sum(
+                1
+                for hint in hints
+                if any(word.startswith(hint) for word in instruction_words)
+            )
+        else:
+            title_words = _words(section.title)
+            if not title_words:
+                continue
+            score = sum(1 for t in title_words if _matches(t, instruction_words))
+            if score * 2 < len(title_words):
+                score = 0
+        if score > 0:
+            scores.append((score, section))
+
+    return scores
+
+
+def select_section(
+    text: str,
+    sections: list[Section],
+    instruction: str,
+    keywords: dict[str, list[str]] | None = None,
+) -> Section | None:
+    """
+    Work out which section an instruction targets, scoring sections with
+    score_sections.
+
+    Returns None when no section clearly wins, when the winning section spans
+    most of the note anyway, or when scope_sections is cleared; callers
+    should then fall back to sending the whole document.
+    """
+    if not scope_sections.get():
+        return None
+    scores = score_sections(sections, instruction, keywords)
+    if not scores:
+        return None
+
+    best_score = max(score for score, _ in scores)
+    best = [section for score, section in scores if score == best_score]
+
+    # A tie between a section and its own subsections resolves to the outermost one
+    outer = min(best, key=lambda s: (s.start, -s.end))
+    if any(s.start < outer.start or s.end > outer.end for s in best):
+        return None
+
+    if outer.end - outer.start > MAX_SECTION_FRACTION * len(text):
+        return None
+    return outer
+
+
+def splice_section(text: str, section: Section, new_section: str) -> str | None:
+    """
+    Replace `section` in `text` with `new_section`, leaving every other byte of
+    the original untouched. The section's original trailing whitespace is kept
+    so the spacing before the next heading does not change.
+
+    Returns None if `new_section` does not start with the section's heading,
+    as it then can't be safely spliced back in.
+    """
+    new_section = new_section.strip("\n")
+    first_line = new_section.split("\n", 1)[0]
+    if first_line.strip() != section.heading.strip():
+        return None
+
+    original = text[section.start : section.end]
+    trailing = original[len(original.rstrip()) :]
+    return text[: section.start] + new_section.rstrip() + trailing + text[section.end :]
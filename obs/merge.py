@@ -0,0 +1,156 @@
+# obs/merge.py
+from datetime import datetime
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from obs.chunks import read_span, splice_file
+from obs.fileio import NoteChanged, atomic_write_text, note_version
+from obs.markdown import Section, scan_sections
+from obs.trace import span
+
+# How many times to merge and try again if the note keeps changing under us
+WRITE_ATTEMPTS = 5
+
+
+class MergeConflict(Exception):
+    """
+    The note was changed while obs was editing it, in a way that can't be
+    merged with obs's edit.
+    """
+
+
+def merge3(base: str, ours: str, theirs: str) -> str | None:
+    """
+    Three-way merge two edited versions of base, line by line. Changes to
+    different lines are combined, and lines added at the same place by both
+    sides are kept, theirs first. Returns None if both sides changed the same
+    lines differently.
+    """
+    base_lines = base.splitlines(keepends=True)
+    # Sorted by position, theirs first where both sides add lines at one place
+    changes = sorted(
+        _changes(base_lines, ours, side=1) + _changes(base_lines, theirs, side=0)
+    )
+
+    merged = []
+    pos = 0
+    previous = None
+    for start, end, side, lines in changes:
+        if previous is not None and (start, end, lines) == previous:
+            # Both sides made the same change
+            continue
+        if start < pos:
+            return None
+        merged.extend(base_lines[pos:start])
+        merged.extend(lines)
+        pos = end
+        previous = (start, end, lines)
+    merged.extend(base_lines[pos:])
+    return "".join(merged)
+
+
+def write_note(
+    file_path: Path, base: str, new_content: str, version: tuple[int, int]
+) -> None:
+    """
+    Atomically replace a note with new_content, which was made from base, the
+    note as read at `version` (see fileio.note_version).
+
+    If the note has changed since, e.g. in Obsidian or by another obs
+    process, new_content is merged with what's there now. If the changes
+    conflict the note is left alone, new_content is saved next to it and
+    MergeConflict is raised.
+    """
+    content = new_content
+    for _ in range(WRITE_ATTEMPTS):
+        try:
+            atomic_write_text(file_path, content, expect=version)
+            return
+        except NoteChanged:
+            with span("write.merge"):
+                version = note_version(file_path)
+                current = file_path.read_text(encoding="utf-8")
+                content = merge3(base, new_content, current)
+            if content is None:
+                conflict_path = _save_conflict(file_path, new_content)
+                raise MergeConflict(
+                    f"'{file_path}' was changed while it was being edited, and "
+                    f"the changes conflict. The new version was saved to "
+                    f"'{conflict_path}'."
+                )
+    raise NoteChanged(f"'{file_path}' kept changing while it was being edited")
+
+
+def splice_note(
+    file_path: Path,
+    target: Section,
+    base: str,
+    new_section: str,
+    version: tuple[int, int],
+) -> None:
+    """
+    Like write_note, for a note too large to read whole: replace the target
+    section (by byte offset) with new_section, which was made from base, the
+    section as read at `version`.
+
+    If the note has changed since, the section is found again by its heading
+    and merged, without reading the rest of the note into memory.
+    """
+    start, end = target.start, target.end
+    content = new_section
+    for _ in range(WRITE_ATTEMPTS):
+        try:
+            with span("write"):
+                splice_file(file_path, start, end, content, expect=version)
+            return
+        except NoteChanged:
+            with span("write.merge"):
+                version = note_version(file_path)
+                with open(file_path, "rb") as f:
+                    sections = [
+                        s
+                        for s in scan_sections(f)
+                        if (s.level, s.heading) == (target.level, target.heading)
+                    ]
+                content = None
+                if sections:
+                    section = min(sections, key=lambda s: abs(s.start - start))
+                    start, end = section.start, section.end
+                    current = read_span(file_path, start, end)
+                    content = merge3(base, new_section, current)
+            if content is None:
+                conflict_path = _save_conflict(file_path, new_section)
+                raise MergeConflict(
+                    f"'{file_path}' was changed while it was being edited, and "
+                    f"the changes conflict. The new version of section "
+                    f"'{target.title}' was saved to '{conflict_path}'."
+                )
+    raise NoteChanged(f"'{file_path}' kept changing while it was being edited")
+
+
+def _changes(
+    base_lines: list[str], text: str, side: int
+) -> list[tuple[int, int, int, list[str]]]:
+    """
+    The changes made to base_lines to get text, as (start, end, side, lines):
+    base_lines[start:end] replaced with lines.
+    """
+    lines = text.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, base_lines, lines, autojunk=False)
+    return [
+        (i1, i2, side, lines[j1:j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _save_conflict(file_path: Path, content: str) -> Path:
+    """
+    Save obs's version of a note next to it, as a conflicted copy.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H%M%S")
+    conflict_path = file_path.with_name(
+        f"{file_path.stem} (conflict {timestamp}){file_path.suffix}"
+    )
+    atomic_write_text(conflict_path, content)
+    return conflict_path
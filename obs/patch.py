@@ -0,0 +1,142 @@
+# obs/patch.py
+import json
+
+from obs.markdown import Section, parse_sections
+
+# Operations the model may return, and the fields each one requires
+EDIT_OPERATIONS = {
+    "insert_after": ("anchor", "content"),
+    "insert_before": ("anchor", "content"),
+    "replace_line": ("anchor", "content"),
+    "delete_line": ("anchor",),
+    "replace_section": ("heading", "content"),
+    "append_to_section": ("heading", "content"),
+}
+
+# Appended to the system message when asking the model for edits instead of a
+# rewritten document.
+EDIT_FORMAT_INSTRUCTIONS = (
+    "Rather than returning the updated document, respond with a JSON object of the form "
+    '{"edits": [...]}, listing the smallest set of edit operations that make the requested change. '
+    "Each edit is an object with an \"op\" field and the fields below:\n"
+    '- {"op": "insert_after", "anchor": <line>, "content": <markdown>}: insert lines after the anchor line.\n'
+    '- {"op": "insert_before", "anchor": <line>, "content": <markdown>}: insert lines before the anchor line.\n'
+    '- {"op": "replace_line", "anchor": <line>, "content": <markdown>}: replace the anchor line.\n'
+    '- {"op": "delete_line", "anchor": <line>}: delete the anchor line.\n'
+    '- {"op": "replace_section", "heading": <heading line>, "content": <markdown>}: replace a heading and everything under it, '
+    "up to the next heading of the same or higher level. The content must start with the heading line.\n"
+    '- {"op": "append_to_section", "heading": <heading line>, "content": <markdown>}: add lines to the end of a section.\n'
+    "Anchors and headings must be copied exactly from a single, unique, non-blank line of the current document. "
+    "Edits are applied in order. Do NOT include any content that is not part of an edit."
+)
+
+
+class PatchError(Exception):
+    """Raised when a list of edit operations can't be applied to a document."""
+
+
+def parse_edits(response: str) -> list[dict]:
+    """
+    Parse and validate a model response of the form {"edits": [...]}.
+    """
+    try:
+        edits = json.loads(response)["edits"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise PatchError(f"Response is not a valid list of edits: {e}")
+    if not isinstance(edits, list) or not edits:
+        raise PatchError("'edits' must be a non-empty list.")
+
+    for edit in edits:
+        if not isinstance(edit, dict) or edit.get("op") not in EDIT_OPERATIONS:
+            raise PatchError(f"Unknown edit operation: {edit!r}")
+        for field in EDIT_OPERATIONS[edit["op"]]:
+            if not isinstance(edit.get(field), str):
+                raise PatchError(f"Edit '{edit['op']}' is missing '{field}'.")
+    return edits
+
+
+def apply_edits(text: str, edits: list[dict]) -> str:
+    """
+    Apply edit operations to `text` in order, leaving everything they don't
+    touch byte-for-byte unchanged.
+
+    Anchors and headings are matched against whole lines, ignoring
+    surrounding whitespace, and must match exactly one line of the document
+    at the time the operation is applied, and a replaced section must start
+    with the same heading line, at the same level. Raises PatchError otherwise.
+    """
+    for edit in edits:
+        op = edit["op"]
+        if "anchor" in EDIT_OPERATIONS[op]:
+            start, end = _find_line(text, edit["anchor"])
+            if not text[:end].endswith("\n"):
+                # The anchor is the final line and has no trailing newline
+                text += "\n"
+                end += 1
+            match op:
+                case "insert_after":
+                    text = text[:end] + _as_lines(edit["content"]) + text[end:]
+                case "insert_before":
+                    text = text[:start] + _as_lines(edit["content"]) + text[start:]
+                case "replace_line":
+                    text = text[:start] + _as_lines(edit["content"]) + text[end:]
+                case "delete_line":
+                    text = text[:start] + text[end:]
+        else:
+            section = _find_section(text, edit["heading"])
+            original = text[section.start : section.end]
+            body_end = section.start + len(original.rstrip())
+            trailing = original[len(original.rstrip()) :] or "\n"
+            match op:
+                case "replace_section":
+                    first_line = edit["content"].strip("\n").split("\n", 1)[0]
+                    if first_line.strip() != section.heading.strip():
+                        raise PatchError(
+                            f"Replacement for section {edit['heading']!r} must "
+                            "start with its heading."
+                        )
+                    text = (
+                        text[: section.start]
+                        + edit["content"].strip("\n")
+                        + trailing
+                        + text[section.end :]
+                    )
+                case "append_to_section":
+                    text = (
+                        text[:body_end]
+                        + "\n"
+                        + edit["content"].strip("\n")
+                        + trailing
+                        + text[section.end :]
+                    )
+    return text
+
+
+def _as_lines(content: str) -> str:
+    return content.rstrip("\n") + "\n"
+
+
+def _find_line(text: str, anchor: str) -> tuple[int, int]:
+    """Return the (start, end) offsets of the single line matching `anchor`."""
+    anchor = anchor.strip()
+    if not anchor:
+        raise PatchError("Anchor must not be empty.")
+
+    matches = []
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        if line.strip() == anchor:
+            matches.append((pos, pos + len(line)))
+        pos += len(line)
+
+    if len(matches) != 1:
+        raise PatchError(f"Anchor {anchor!r} matched {len(matches)} lines.")
+    return matches[0]
+
+
+def _find_section(text: str, heading: str) -> Section:
+    heading = heading.strip()
+    matches = [s for s in parse_sections(text) if s.heading.strip() == heading]
+    if len(matches) != 1:
+        raise PatchError(f"Heading {heading!r} matched {len(matches)} sections.")
+    return matches[0]
@@ -0,0 +1,187 @@
+# obs/retry.py
+import random
+import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, fields
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """
+    How API requests are made:
+      timeout: seconds to wait for a whole, non-streamed response before
+        giving up on an attempt; nothing arrives until the response is done,
+        so this must allow for the longest rewrite
+      stream_timeout: seconds to wait for each chunk of a streamed response
+        before giving up on an attempt
+      deadline: seconds after which no further attempts are started; retries
+        are given only the time left before it
+      retries: attempts to make after the first, on transient errors only
+      backoff: base delay in seconds before a retry, doubled on each retry,
+        with full jitter
+      max_backoff: upper limit on the delay before a retry
+      hedge_after: if set, seconds after which a second, identical request is
+        sent if the first hasn't produced any content yet; whichever produces
+        content first is used
+    """
+
+    timeout: float = 600.0
+    stream_timeout: float = 60.0
+    deadline: float = 180.0
+    retries: int = 2
+    backoff: float = 0.5
+    max_backoff: float = 8.0
+    hedge_after: float | None = None
+
+    @classmethod
+    def from_config(cls, config: dict, vault_code: str) -> "RequestPolicy":
+        """
+        Read the policy from the `llm` section of the config, where `vaults`
+        may override any option per vault:
+
+            llm:
+              timeout: 30
+              retries: 3
+              vaults:
+                C:
+                  hedge_after: 4
+        """
+        options = dict(config.get("llm") or {})
+        vault_options = (options.pop("vaults", None) or {}).get(vault_code) or {}
+        options.update(vault_options)
+
+        names = {field.name for field in fields(cls)}
+        for name in options:
+            if name not in names:
+                print(f"Error: Unknown option '{name}' in 'llm' config.")
+                sys.exit(1)
+        return cls(**options)
+
+
+# Set per command by cli.run_action, from the config for the command's vault
+request_policy: ContextVar[RequestPolicy] = ContextVar(
+    "request_policy", default=RequestPolicy()
+)
+
+
+def call_with_retries(
+    attempt: Callable[[float], object],
+    discard: Callable[[object], None] | None = None,
+    stream: bool = False,
+):
+    """
+    Call attempt(timeout) under the current request policy, retrying with
+    jittered exponential backoff on transient errors until it succeeds, the
+    retries run out or the deadline passes. Each attempt is hedged if the
+    policy says so, with discard called on the result of a losing request.
+
+    The timeout is the policy's stream_timeout if `stream`, else its timeout.
+    """
+    policy = request_policy.get()
+    limit = policy.stream_timeout if stream else policy.timeout
+    deadline = time.monotonic() + policy.deadline
+    for number in range(policy.retries + 1):
+        if number == 0:
+            timeout = limit
+        else:
+            timeout = max(min(limit, deadline - time.monotonic()), 1.0)
+        try:
+            if policy.hedge_after is not None:
+                return hedged(lambda: attempt(timeout), policy.hedge_after, discard)
+            return attempt(timeout)
+        except Exception as e:
+            if number == policy.retries or not is_transient(e):
+                raise
+            delay = _retry_delay(e, number, policy)
+            if time.monotonic() + delay >= deadline:
+                raise
+            print(
+                f"Warning: OpenAI API request failed ({e}), "
+                f"retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def hedged(
+    request: Callable[[], object],
+    hedge_after: float,
+    discard: Callable[[object], None] | None = None,
+):
+    """
+    Make a request, and if it hasn't returned after hedge_after seconds make
+    the same request again. Returns the first successful result, or raises the
+    last error if both fail. A request that loses the race is left to finish
+    in the background, and discard is called on its result.
+    """
+    futures = [_start(request)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done:
+        futures.append(_start(request))
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if discard is not None:
+                    for loser in pending:
+                        loser.add_done_callback(lambda f: _discard(f, discard))
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a request that failed with error is worth retrying: timeouts,
+    connection errors, rate limits and server errors.
+    """
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_delay(error: Exception, number: int, policy: RequestPolicy) -> float:
+    delay = random.uniform(0, min(policy.max_backoff, policy.backoff * 2**number))
+    # Rate limit responses say how long to wait
+    response = getattr(error, "response", None)
+    try:
+        retry_after = float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return delay
+    return max(delay, min(retry_after, policy.max_backoff))
+
+
+def _start(request: Callable[[], object]) -> Future:
+    """
+    Run request in a daemon thread, so a stalled request never holds up the
+    process exiting, in a copy of the current context.
+    """
+    future = Future()
+    context = copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(request))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name="obs-request").start()
+    return future
+
+
+def _discard(future: Future, discard: Callable[[object], None]) -> None:
+    if future.exception() is None:
+        try:
+            discard(future.result())
+        except Exception:
+            pass
@@ -0,0 +1,129 @@
+# obs/trace.py
+import json
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+
+class Trace:
+    """
+    Timing spans recorded while running one command. Spans may be added from
+    several threads, e.g. a backup being recorded while the API call is in
+    flight.
+    """
+
+    def __init__(self, command: str, start: float):
+        self.command = command
+        self.start = start
+        self.spans: list[tuple[str, float, float, dict]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, attrs: dict | None = None):
+        attrs = dict(attrs or {})
+        thread = threading.current_thread()
+        if thread is not threading.main_thread():
+            attrs["thread"] = thread.name
+        with self._lock:
+            self.spans.append((name, start, end, attrs))
+
+
+# The trace of the command running in the current context, if it's being traced
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_file_lock = threading.Lock()
+
+
+class span:
+    """
+    Time a block as a named span of the current trace:
+
+        with span("api", model="gpt-4o"):
+            ...
+
+    When the command isn't being traced this only costs a ContextVar lookup.
+    Attributes can be added to the span from inside the block via `attrs`.
+    """
+
+    __slots__ = ("name", "attrs", "trace", "start")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add(self.name, self.start, time.perf_counter(), self.attrs)
+
+
+def start_trace(command: str, start: float) -> Trace:
+    """
+    Start tracing the command running in the current context, from `start`
+    (a time.perf_counter() value).
+    """
+    trace = Trace(command, start)
+    _current.set(trace)
+    return trace
+
+
+def finish_trace(
+    trace: Trace, profile: bool, trace_file: str | None, exit_code: int
+) -> None:
+    """
+    Stop tracing, then print a breakdown of the spans if `profile` is set and
+    append the trace to `trace_file` (as one JSON line) if given.
+    """
+    _current.set(None)
+    total = time.perf_counter() - trace.start
+    spans = sorted(trace.spans, key=lambda s: (s[1], -s[2]))
+
+    if profile:
+        print(f"Profile of '{trace.command}' ({total * 1000:.1f} ms total):")
+        for name, start, end, attrs, depth in _nest(spans):
+            label = "  " * depth + name
+            details = "  ".join(f"{key}={value}" for key, value in attrs.items())
+            print(f"  {label:<28} {(end - start) * 1000:>9.1f} ms  {details}".rstrip())
+
+    if trace_file:
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "command": trace.command,
+            "exit_code": exit_code,
+            "ms": round(total * 1000, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - trace.start) * 1000, 3),
+                    "ms": round((end - start) * 1000, 3),
+                    **attrs,
+                }
+                for name, start, end, attrs in spans
+            ],
+        }
+        path = Path(trace_file).expanduser()
+        with _file_lock:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"Warning: Could not write trace to '{path}': {e}")
+
+
+def _nest(spans: list[tuple]):
+    """
+    Yield spans (sorted by start time) with their depth, i.e. how many earlier
+    spans from the same thread contain them.
+    """
+    open_ends: dict[str | None, list[float]] = {}
+    for name, start, end, attrs in spans:
+        thread = attrs.get("thread")
+        ends = [e for e in open_ends.get(thread, []) if e > start]
+        yield name, start, end, attrs, sum(1 for e in ends if e >= end)
+        open_ends[thread] = ends + [end]
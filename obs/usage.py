@@ -0,0 +1,90 @@
+# obs/usage.py
+import json
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+
+from obs.config import CACHE_DIR
+
+USAGE_LOG_PATH = CACHE_DIR / "usage.jsonl"
+
+# Set per command by cli.run_action, e.g. "C insert", to group the usage log
+usage_command: ContextVar[str] = ContextVar("usage_command", default="")
+
+_log_lock = threading.Lock()
+
+
+def record_usage(
+    model: str, usage, seconds: float, first_token_seconds: float | None = None
+) -> None:
+    """
+    Append one API call to the usage log: its token counts as reported by the
+    API (including prompt tokens served from the provider's prompt cache) and
+    its latency. Failing to write the log is not an error.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "command": usage_command.get(),
+        "model": model,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "seconds": round(seconds, 3),
+    }
+    if first_token_seconds is not None:
+        entry["first_token_seconds"] = round(first_token_seconds, 3)
+
+    with _log_lock:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(USAGE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+
+def usage_summary() -> dict[str, dict]:
+    """
+    Summarise the usage log per command and model: the number of calls, token
+    totals, the share of prompt tokens served from the prompt cache, and
+    median and 95th percentile latency.
+    """
+    groups: dict[str, list[dict]] = {}
+    try:
+        with open(USAGE_LOG_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                name = f"{entry.get('command') or '-'} ({entry.get('model')})"
+                groups.setdefault(name, []).append(entry)
+    except FileNotFoundError:
+        pass
+
+    summary = {}
+    for name, entries in sorted(groups.items()):
+        prompt_tokens = sum(e["prompt_tokens"] for e in entries)
+        cached_tokens = sum(e["cached_tokens"] for e in entries)
+        latencies = sorted(e["seconds"] for e in entries)
+        summary[name] = {
+            "calls": len(entries),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cached_share": (
+                round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0
+            ),
+            "completion_tokens": sum(e["completion_tokens"] for e in entries),
+            "p50_seconds": _percentile(latencies, 0.5),
+            "p95_seconds": _percentile(latencies, 0.95),
+        }
+    return summary
+
+
+def clear_usage() -> None:
+    USAGE_LOG_PATH.unlink(missing_ok=True)
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
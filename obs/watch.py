@@ -0,0 +1,304 @@
+# obs/watch.py
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from obs.capture import run_captured
+from obs.cli import run_action
+from obs.config import CACHE_DIR
+from obs.fileio import atomic_write_text
+from obs.resolve import excluded_folders
+
+# Routing headers in an inbox file's front matter, e.g.
+#   ---
+#   obs-target: Jane Doe
+#   obs-action: insert
+#   ---
+ROUTING_RE = re.compile(r"^obs-(target|action|edits):[ \t]*(.*?)[ \t]*$")
+ACTIONS = ("create", "append", "insert", "insert-many")
+INBOX_SUFFIXES = (".md", ".txt")
+
+# Seconds between scans of the inbox when polling, and between safety rescans
+# when inotify is watching it
+POLL_INTERVAL = 1.0
+RESCAN_INTERVAL = 30.0
+# Seconds since a file was last modified before polling treats it as complete
+SETTLE_SECONDS = 1.0
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x08
+IN_MOVED_TO = 0x80
+IN_NONBLOCK = 0o4000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def watch(config: dict, vault_code: str, concurrency: int = 4, once: bool = False):
+    """
+    Watch the vault's inbox folder (`inbox_dir` in the config, relative to the
+    vault, default `Inbox`) and run every file dropped into it through create,
+    append, insert or insert-many, as chosen by its routing header (see
+    parse_inbox_file). Up to `concurrency` files are processed at once.
+
+    Each processed file is recorded in a state file, so that it is never
+    processed again, even after a restart. Failed files are retried only once
+    they have been modified. With `once`, the files already in the inbox are
+    processed and watch returns.
+    """
+    vaults = config.get("vaults", {})
+    if vault_code not in vaults:
+        print(f"Error: Vault code '{vault_code}' not found in config.")
+        sys.exit(1)
+    inbox_dir = Path(config.get("inbox_dir", "Inbox")).as_posix()
+    inbox = Path(vaults[vault_code]).expanduser() / inbox_dir
+    if not inbox.is_dir():
+        print(f"Error: Inbox folder '{inbox}' does not exist.")
+        sys.exit(1)
+
+    from obs.llm import size_client
+
+    size_client(config, concurrency)
+
+    state = _State(CACHE_DIR / f"watch-{vault_code}.jsonl")
+    in_flight: set[str] = set()
+    in_flight_lock = threading.Lock()
+
+    def process(name: str, mtime_ns: int):
+        # Inbox files are in the vault too, but are never the notes to update
+        excluded_folders.set((inbox_dir,))
+        try:
+            status, summary = _process_file(config, vault_code, inbox / name)
+            state.record(name, mtime_ns, status)
+            print(f"{status:<6} {name}: {summary}", flush=True)
+        finally:
+            with in_flight_lock:
+                in_flight.discard(name)
+
+    notifier = None if once else _Inotify.open(inbox)
+    if not once:
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        method = "inotify" if notifier is not None else "polling"
+        print(f"Watching '{inbox}' ({method}), Ctrl-C to stop", flush=True)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        closed: set[str] = set()
+        try:
+            while True:
+                settled = time.time_ns() - int(SETTLE_SECONDS * 1e9)
+                for name, mtime_ns in _new_files(inbox, state):
+                    # Files still being written are left for a later scan
+                    if not once and name not in closed and mtime_ns > settled:
+                        continue
+                    with in_flight_lock:
+                        if name in in_flight:
+                            continue
+                        in_flight.add(name)
+                    pool.submit(process, name, mtime_ns)
+                closed.clear()
+
+                if once:
+                    break
+                if notifier is None:
+                    time.sleep(POLL_INTERVAL)
+                else:
+                    closed = notifier.read(RESCAN_INTERVAL)
+        except KeyboardInterrupt:
+            print("Stopping once the files in progress are done...")
+        finally:
+            if notifier is not None:
+                notifier.close()
+
+
+def parse_inbox_file(text: str) -> tuple[dict[str, str], str]:
+    """
+    Split an inbox file into its routing header and its body. The header is
+    read from `obs-target`, `obs-action` and `obs-edits` lines in the file's
+    front matter; other front matter is dropped. A file with no front matter
+    is all body.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[0].strip() != "---":
+        return {}, text.strip()
+    for end, line in enumerate(lines[1:], start=1):
+        if line.strip() == "---":
+            break
+    else:
+        return {}, text.strip()
+
+    routing = {}
+    for line in lines[1:end]:
+        match = ROUTING_RE.match(line.rstrip("\r\n"))
+        if match:
+            routing[match.group(1)] = match.group(2).strip("'\"")
+    return routing, "".join(lines[end + 1 :]).strip()
+
+
+def _process_file(config: dict, vault_code: str, path: Path) -> tuple[str, str]:
+    """
+    Run one inbox file through the command its routing header asks for,
+    returning its status ("ok" or "error") and a one-line summary.
+    """
+    try:
+        routing, body = parse_inbox_file(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError) as e:
+        return "error", f"Could not read file: {e}"
+
+    # Targets may be written as links
+    target = routing.get("target", "").strip().removeprefix("[[").removesuffix("]]")
+    # Without a target, the body is inserted into every note it mentions
+    action = routing.get("action", "insert" if target else "insert-many").lower()
+    if action not in ACTIONS:
+        return "error", f"Unknown obs-action '{action}', use {', '.join(ACTIONS)}."
+    if action != "insert-many" and not target:
+        return "error", f"obs-action '{action}' needs an obs-target."
+    if not body and action != "create":
+        return "error", "The file has nothing to send."
+
+    edits = routing.get("edits", "").lower() in ("true", "yes", "1")
+    exit_code, output = run_captured(
+        run_action, config, vault_code, action, target, body, edits=edits
+    )
+    label = f"{action} {target}".rstrip()
+    if exit_code != 0:
+        reason = output.splitlines()[-1] if output else f"exit code {exit_code}"
+        return "error", f"{label}: {reason}"
+    return "ok", label
+
+
+def _new_files(inbox: Path, state: "_State") -> list[tuple[str, int]]:
+    """
+    List the inbox files not yet processed (or failed and modified since),
+    oldest first, with their modification times.
+    """
+    files = []
+    with os.scandir(inbox) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith(".") or not name.endswith(INBOX_SUFFIXES):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                mtime_ns = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+            if state.is_new(name, mtime_ns):
+                files.append((name, mtime_ns))
+    files.sort(key=lambda file: (file[1], file[0]))
+    return files
+
+
+class _State:
+    """
+    The inbox files processed so far, kept in memory and appended to a JSON
+    lines file as each one finishes, so a restart picks up where it left off.
+    The file is compacted to one line per file on load.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: dict[str, tuple[int, str]] = {}
+        self._lock = threading.Lock()
+
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        name, mtime_ns = entry["name"], entry["mtime_ns"]
+                        self.files[name] = (mtime_ns, entry["status"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(
+            path,
+            "".join(
+                self._line(name, mtime_ns, status)
+                for name, (mtime_ns, status) in self.files.items()
+            ),
+        )
+
+    def is_new(self, name: str, mtime_ns: int) -> bool:
+        seen = self.files.get(name)
+        return seen is None or (seen[1] != "ok" and seen[0] != mtime_ns)
+
+    def record(self, name: str, mtime_ns: int, status: str):
+        with self._lock:
+            self.files[name] = (mtime_ns, status)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(self._line(name, mtime_ns, status))
+
+    @staticmethod
+    def _line(name: str, mtime_ns: int, status: str) -> str:
+        entry = {
+            "name": name,
+            "mtime_ns": mtime_ns,
+            "status": status,
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        return json.dumps(entry) + "\n"
+
+
+class _Inotify:
+    """
+    A minimal inotify(7) watch on one directory through libc, reporting files
+    that were closed after writing or moved into it.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    @classmethod
+    def open(cls, directory: Path) -> "_Inotify | None":
+        """
+        Watch directory, or return None if inotify isn't available here.
+        """
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            fd = libc.inotify_init1(IN_NONBLOCK)
+            if fd < 0:
+                return None
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return cls(fd)
+
+    def read(self, timeout: float) -> set[str]:
+        """
+        Wait up to timeout seconds for events, returning the names of the
+        files they were about.
+        """
+        names = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        while readable:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if name:
+                    names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
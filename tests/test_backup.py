@@ -0,0 +1,108 @@
+# tests/test_backup.py
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from obs import backup
+
+
+def versions(*ages_in_days: int) -> list[dict]:
+    now = datetime.now()
+    return [
+        {
+            "time": (now - timedelta(days=age)).isoformat(timespec="seconds"),
+            "hash": str(age),
+            "size": 1,
+        }
+        for age in ages_in_days
+    ]
+
+
+@pytest.mark.parametrize(
+    "retention, kept",
+    [
+        ({}, ["30", "10", "1", "0"]),
+        ({"keep_last": 2}, ["1", "0"]),
+        ({"max_age_days": 7}, ["1", "0"]),
+        ({"keep_last": 3, "max_age_days": 20}, ["10", "1", "0"]),
+        ({"keep_last": 0}, ["0"]),
+    ],
+)
+def test_apply_retention(retention, kept):
+    result = backup.apply_retention(versions(30, 10, 1, 0), retention)
+    assert [v["hash"] for v in result] == kept
+
+
+def test_apply_retention_keeps_the_latest_version():
+    result = backup.apply_retention(versions(30, 10), {"max_age_days": 7})
+    assert [v["hash"] for v in result] == ["10"]
+
+
+@pytest.fixture
+def vault(tmp_path):
+    vault_path = tmp_path / "vault"
+    (vault_path / "People").mkdir(parents=True)
+    return vault_path, tmp_path / "backups"
+
+
+def test_backups_are_stored_once_per_content(vault):
+    vault_path, backup_dir = vault
+    note = vault_path / "People" / "Jane Doe.md"
+    note.write_text("first")
+    backup.backup_note("C", vault_path, "People/Jane Doe", backup_dir)
+    backup.backup_note("C", vault_path, "People/Jane Doe", backup_dir)
+    note.write_text("second")
+    backup.backup_note("C", vault_path, "People/Jane Doe", backup_dir)
+    (vault_path / "Copy.md").write_text("second")
+    backup.backup_note("C", vault_path, "Copy", backup_dir)
+
+    history = backup.note_history("C", "People/Jane Doe", backup_dir)
+    assert [v["size"] for v in history] == [5, 6]
+    blobs = sorted((backup_dir / "C" / "objects").glob("*/*.gz"))
+    assert len(blobs) == 2
+    assert {gzip.decompress(blob.read_bytes()) for blob in blobs} == {
+        b"first",
+        b"second",
+    }
+    # The manifest of a note in a subfolder is a single flat file
+    manifests = {p.name for p in (backup_dir / "C" / "manifests").iterdir()}
+    assert manifests == {"People%2FJane%20Doe.jsonl", "Copy.jsonl"}
+    assert not list((backup_dir / "C").rglob("*.tmp"))
+
+
+def test_restore_note(vault):
+    vault_path, backup_dir = vault
+    note = vault_path / "Note.md"
+    note.write_text("first")
+    backup.backup_note("C", vault_path, "Note", backup_dir)
+    note.write_text("second")
+
+    backup.restore_note("C", vault_path, "Note", backup_dir, 1)
+    assert note.read_text() == "first"
+    # The restore backed up what it replaced, so it can be undone
+    backup.restore_note("C", vault_path, "Note", backup_dir, 1)
+    assert note.read_text() == "second"
+
+
+def test_prune_backups(vault):
+    vault_path, backup_dir = vault
+    note = vault_path / "Note.md"
+    for content in ("one", "two", "three"):
+        note.write_text(content)
+        backup.backup_note("C", vault_path, "Note", backup_dir)
+    blobs = list((backup_dir / "C" / "objects").glob("*/*.gz"))
+    old = time.time() - 2 * backup.BLOB_GRACE_SECONDS
+    for blob in blobs:
+        os.utime(blob, (old, old))
+    # Stored, but not yet recorded in a manifest
+    pending = backup._store_blob(backup_dir / "C", b"pending")
+
+    backup.prune_backups("C", backup_dir, {"keep_last": 1})
+
+    history = backup.note_history("C", "Note", backup_dir)
+    assert [v["size"] for v in history] == [5]
+    remaining = {p.name for p in (backup_dir / "C" / "objects").glob("*/*.gz")}
+    assert remaining == {f"{history[0]['hash']}.gz", f"{pending}.gz"}
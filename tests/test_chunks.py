@@ -0,0 +1,80 @@
+# tests/test_chunks.py
+import pytest
+
+from obs import chunks
+from obs.fileio import NoteChanged, note_version
+
+
+def section(title: str, body_line: str, lines: int) -> str:
+    return f"## {title}\n" + f"- {body_line}\n" * lines + "\n"
+
+
+# Tasks is small, Journal is over the budget set below, and Reading mentions
+# the cello only in its body
+NOTE = (
+    "# Big note\n\n"
+    + section("Tasks", "write docs", 5)
+    + section("Journal", "a long day of work", 400)
+    + section("Reading", "started a book about learning the cello", 5)
+)
+
+
+@pytest.fixture
+def note(tmp_path):
+    path = tmp_path / "Big note.md"
+    path.write_bytes(NOTE.encode("utf-8"))
+    token = chunks.token_budget.set(1000)
+    yield path
+    chunks.token_budget.reset(token)
+
+
+def title(chunk) -> str | None:
+    return None if chunk is None else chunk[0].title
+
+
+def test_select_chunk_by_heading(note):
+    assert title(chunks.select_chunk(note, "Add a task to email Bob")) == "Tasks"
+
+
+def test_select_chunk_by_body(note):
+    assert title(chunks.select_chunk(note, "She plays the cello now")) == "Reading"
+
+
+def test_select_chunk_skips_sections_over_the_budget(note):
+    assert chunks.select_chunk(note, "Add to the journal") is None
+
+
+def test_select_chunk_offsets_and_outline(note):
+    target, outline = chunks.select_chunk(note, "Add a task")
+    start = NOTE.index("## Tasks")
+    assert (target.start, target.end) == (start, NOTE.index("## Journal"))
+    assert [s.title for s in outline] == ["Big note", "Tasks"]
+
+
+def test_insert_budget_is_bounded_by_the_output_limit(note):
+    assert chunks.insert_budget() == 1000
+    chunks.token_budget.set(10 * chunks.OUTPUT_TOKENS)
+    assert chunks.insert_budget() == chunks.INSERT_TOKENS
+    assert chunks.exceeds_budget(note, chunks.insert_budget()) is False
+
+
+def test_read_tail_starts_at_a_heading(note):
+    tail = chunks.read_tail(note)
+    assert tail.startswith("## Reading\n")
+    assert NOTE.endswith(tail)
+
+
+def test_splice_file(note):
+    start, end = NOTE.index("## Tasks"), NOTE.index("## Journal")
+    chunks.splice_file(note, start, end, "## Tasks\n- done ✓\n\n")
+    assert note.read_text(encoding="utf-8") == (
+        NOTE[:start] + "## Tasks\n- done ✓\n\n" + NOTE[end:]
+    )
+
+
+def test_splice_file_refuses_a_changed_note(note):
+    version = note_version(note)
+    note.write_bytes(NOTE.encode("utf-8") + b"- edited elsewhere\n")
+    with pytest.raises(NoteChanged):
+        chunks.splice_file(note, 0, 10, "# Replaced", expect=version)
+    assert note.read_bytes().endswith(b"- edited elsewhere\n")
@@ -0,0 +1,92 @@
+# tests/test_contacts.py
+from obs.commands.cmd_create_person import PERSON_TEMPLATE
+from obs.contacts import Contact, fill_contact, read_csv, read_vcards
+
+GOOGLE_CSV = (
+    "Name,Given Name,Family Name,E-mail 1 - Value,Phone 1 - Value,"
+    "Address 1 - Formatted,Organization 1 - Name,Organization 1 - Title\n"
+    'Jane Doe,Jane,Doe,jdoe@example.com,+61 400 000 000,"1 Main St\n'
+    'Sydney NSW 2000\nAustralia",Acme,Engineer\n'
+    ",Bob,Smith,bob@example.com,,,,\n"
+    ",,,nobody@example.com,,,,\n"
+)
+
+VCARD = (
+    "BEGIN:VCARD\r\n"
+    "VERSION:3.0\r\n"
+    "N:Doe;Jane;;;\r\n"
+    "item1.EMAIL;TYPE=INTERNET:jdoe@example.com\r\n"
+    "EMAIL:second@example.com\r\n"
+    "TEL;TYPE=CELL:+61 400 000 000\r\n"
+    "ADR;TYPE=HOME:;;1 Main St\\nUnit 2;Sydney;NSW;2000;Australia\r\n"
+    "ORG:Acme\\, Inc.;Research\r\n"
+    "TITLE:Senior\\nEngineer\r\n"
+    "NOTE:Met at the conference\\nLikes tea and a very long note that is\r\n"
+    "  folded onto the next line\r\n"
+    "END:VCARD\r\n"
+    "BEGIN:VCARD\r\n"
+    "EMAIL:nameless@example.com\r\n"
+    "END:VCARD\r\n"
+)
+
+
+def test_read_csv(tmp_path):
+    path = tmp_path / "contacts.csv"
+    path.write_text(GOOGLE_CSV, encoding="utf-8")
+    jane, bob = read_csv(path)
+    assert jane == Contact(
+        name="Jane Doe",
+        email="jdoe@example.com",
+        phone="+61 400 000 000",
+        address="1 Main St\nSydney NSW 2000\nAustralia",
+        company="Acme",
+        role="Engineer",
+    )
+    assert bob.name == "Bob Smith"
+    assert bob.email == "bob@example.com"
+
+
+def test_read_vcards(tmp_path):
+    path = tmp_path / "contacts.vcf"
+    path.write_text(VCARD, encoding="utf-8")
+    (jane,) = read_vcards(path)
+    assert jane.name == "Jane Doe"
+    assert jane.email == "jdoe@example.com"
+    assert jane.address == "1 Main St\nUnit 2, Sydney, NSW, 2000, Australia"
+    assert jane.company == "Acme, Inc."
+    assert jane.role == "Senior\nEngineer"
+    assert jane.notes.splitlines() == [
+        "Met at the conference",
+        "Likes tea and a very long note that is folded onto the next line",
+    ]
+
+
+def test_fill_contact_keeps_fields_on_one_line():
+    contact = Contact(
+        name="Jane Doe",
+        email="jdoe@example.com",
+        address="1 Main St\nSydney NSW 2000\n\nAustralia",
+        company="Acme\nResearch",
+        role="Senior\nEngineer",
+        notes="Met at the conference\nLikes tea",
+    )
+    template = PERSON_TEMPLATE.format(name="Jane Doe")
+    content = fill_contact(template, contact)
+    lines = content.splitlines()
+    assert "- **Address:** 1 Main St, Sydney NSW 2000, Australia" in lines
+    assert "\t- [[Acme, Research]]" in lines
+    assert "\t- Senior, Engineer" in lines
+    assert "- Likes tea" in lines
+    # Everything else in the template is where it was
+    assert [line for line in lines if line.startswith("#")] == [
+        line for line in template.splitlines() if line.startswith("#")
+    ]
+    assert fill_contact(content, contact) == content
+
+
+def test_fill_contact_leaves_existing_values():
+    template = PERSON_TEMPLATE.format(name="Jane Doe")
+    content = fill_contact(template, Contact(name="Jane Doe", email="a@example.com"))
+    assert fill_contact(content, Contact(name="Jane Doe", email="b@example.com")) == (
+        content
+    )
@@ -0,0 +1,34 @@
+# tests/test_crm.py
+import pytest
+
+from obs.commands.cmd_create_person import PERSON_TEMPLATE
+from obs.crm import apply_fast_path
+
+CONTACT = PERSON_TEMPLATE.format(name="Jane Doe")
+
+
+def test_fast_path_fields():
+    content, unmatched = apply_fast_path(
+        CONTACT, "email is jdoe@gmail.com; works at [[Coca Cola]] as a data scientist"
+    )
+    assert unmatched == ""
+    assert "- **Email:** jdoe@gmail.com" in content
+    assert "\t- [[Coca Cola]]" in content
+    assert "\t- Data scientist" in content
+
+
+@pytest.mark.parametrize(
+    "instruction",
+    [
+        "works at home on Fridays",
+        "works at Coca Cola since 2020",
+        "works as a teacher at the local school",
+        "works as a data scientist since 2020",
+        "her job is driving me crazy",
+        "birthday is next week I think",
+        "lives at home with her parents",
+        "lives at 4 Elm Road since 2019",
+    ],
+)
+def test_fast_path_leaves_other_phrases_to_the_model(instruction):
+    assert apply_fast_path(CONTACT, instruction) == (CONTACT, instruction)
@@ -0,0 +1,94 @@
+# tests/test_markdown.py
+import pytest
+
+from obs.markdown import parse_sections, scope_sections, select_section, splice_section
+
+NOTE = (
+    "---\n"
+    "# front matter, not a heading\n"
+    "---\n"
+    "# Project\n\n"
+    "intro\n\n"
+    "## Meetings\n"
+    "- kickoff\n\n"
+    "```\n"
+    "# code, not a heading\n"
+    "```\n\n"
+    "## Tasks\n"
+    "- write docs\n\n"
+    "### Done\n"
+    "- set up repo\n\n"
+    "## Notes\n"
+    + "Some longer notes about the project.\n" * 20
+)
+
+
+def section(title: str):
+    (found,) = [s for s in parse_sections(NOTE) if s.title == title]
+    return found
+
+
+def test_parse_sections():
+    sections = parse_sections(NOTE)
+    assert [(s.level, s.title) for s in sections] == [
+        (1, "Project"),
+        (2, "Meetings"),
+        (2, "Tasks"),
+        (3, "Done"),
+        (2, "Notes"),
+    ]
+    tasks = section("Tasks")
+    assert NOTE[tasks.start : tasks.end] == (
+        "## Tasks\n- write docs\n\n### Done\n- set up repo\n\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "instruction, title",
+    [
+        ("Add a task to email Bob", "Tasks"),
+        ("Record the meeting with the design team", "Meetings"),
+        # A tie between a section and its subsection goes to the outer one
+        ("Mark the done tasks", "Tasks"),
+    ],
+)
+def test_select_section(instruction, title):
+    assert select_section(NOTE, parse_sections(NOTE), instruction) == section(title)
+
+
+@pytest.mark.parametrize(
+    "instruction",
+    [
+        # No section's title is mentioned
+        "Add that the budget was approved",
+        # Two unrelated sections tie
+        "Move the meeting tasks",
+        # The project section is most of the note
+        "Update the project",
+    ],
+)
+def test_select_section_without_a_clear_winner(instruction):
+    assert select_section(NOTE, parse_sections(NOTE), instruction) is None
+
+
+def test_select_section_when_not_scoping():
+    token = scope_sections.set(False)
+    try:
+        assert select_section(NOTE, parse_sections(NOTE), "Add a task") is None
+    finally:
+        scope_sections.reset(token)
+
+
+def test_splice_section_keeps_the_rest_of_the_note():
+    tasks = section("Tasks")
+    new = splice_section(NOTE, tasks, "## Tasks\n- write docs\n- add tests\n")
+    assert new == (
+        NOTE[: tasks.start]
+        + "## Tasks\n- write docs\n- add tests\n\n"
+        + NOTE[tasks.end :]
+    )
+
+
+@pytest.mark.parametrize("new_section", ["- add tests", "### Tasks\n- add tests"])
+def test_splice_section_needs_the_heading(new_section):
+    assert splice_section(NOTE, section("Tasks"), new_section) is None
@@ -0,0 +1,20 @@
+# tests/test_merge.py
+from obs.merge import merge3
+
+
+def test_merge_changes_to_different_lines():
+    base = "a\nb\nc\n"
+    assert merge3(base, "A\nb\nc\n", "a\nb\nC\n") == "A\nb\nC\n"
+
+
+def test_merge_same_change_on_both_sides():
+    base = "a\nb\nc\n"
+    assert merge3(base, "a\nB\nc\n", "a\nB\nc\n") == "a\nB\nc\n"
+
+
+def test_merge_additions_at_same_place_keeps_theirs_first():
+    assert merge3("a\n", "a\nours\n", "a\ntheirs\n") == "a\ntheirs\nours\n"
+
+
+def test_merge_conflict():
+    assert merge3("a\nb\nc\n", "a\nours\nc\n", "a\ntheirs\nc\n") is None
@@ -0,0 +1,52 @@
+# tests/test_patch.py
+import pytest
+
+from obs.patch import PatchError, apply_edits
+
+NOTE = "# Title\n\nintro\n\n## Tasks\n- one\n- two\n\n## Notes\nsome notes\n"
+
+
+def test_insert_after_anchor():
+    edits = [{"op": "insert_after", "anchor": "- one", "content": "- one and a half"}]
+    expected = NOTE.replace("- one\n", "- one\n- one and a half\n")
+    assert apply_edits(NOTE, edits) == expected
+
+
+def test_anchor_ignores_surrounding_whitespace():
+    edits = [{"op": "replace_line", "anchor": "  some notes ", "content": "new notes"}]
+    assert apply_edits(NOTE, edits) == NOTE.replace("some notes", "new notes")
+
+
+def test_anchor_on_final_line_without_newline():
+    edits = [{"op": "insert_after", "anchor": "last", "content": "after"}]
+    assert apply_edits("first\nlast", edits) == "first\nlast\nafter\n"
+
+
+@pytest.mark.parametrize("anchor", ["- three", "", "\n"])
+def test_missing_anchor(anchor):
+    with pytest.raises(PatchError):
+        apply_edits(NOTE, [{"op": "delete_line", "anchor": anchor}])
+
+
+def test_ambiguous_anchor():
+    with pytest.raises(PatchError):
+        apply_edits("- a\n- a\n", [{"op": "delete_line", "anchor": "- a"}])
+
+
+def test_replace_section():
+    edits = [
+        {"op": "replace_section", "heading": "## Tasks", "content": "## Tasks\n- new"}
+    ]
+    assert apply_edits(NOTE, edits) == NOTE.replace("- one\n- two\n", "- new\n")
+
+
+@pytest.mark.parametrize("content", ["- new", "### Tasks\n- new", "## Todo\n- new"])
+def test_replace_section_must_keep_heading(content):
+    edits = [{"op": "replace_section", "heading": "## Tasks", "content": content}]
+    with pytest.raises(PatchError):
+        apply_edits(NOTE, edits)
+
+
+def test_append_to_section_keeps_spacing():
+    edits = [{"op": "append_to_section", "heading": "## Tasks", "content": "- three"}]
+    assert apply_edits(NOTE, edits) == NOTE.replace("- two\n", "- two\n- three\n")
@@ -0,0 +1,45 @@
+# tests/test_resolve.py
+import pytest
+
+from obs import resolve
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    monkeypatch.setattr(resolve, "NAMES_DIR", tmp_path / "names")
+    monkeypatch.setattr(resolve, "INDEX_DIR", tmp_path / "index")
+    vault_path = tmp_path / "vault"
+    (vault_path / "People").mkdir(parents=True)
+    (vault_path / "People" / "Jane Doe.md").write_text("# Jane Doe\n")
+    (vault_path / "Meeting Notes.md").write_text("")
+    return vault_path
+
+
+@pytest.mark.parametrize("filename", ["jane doe", "JANE DOE.md", "people/jane doe"])
+def test_resolve_ignores_case(vault, filename):
+    assert resolve.resolve_note("T", vault, filename) == ("People/Jane Doe", [])
+
+
+def test_resolve_unique_prefix(vault):
+    assert resolve.resolve_note("T", vault, "jane d") == ("People/Jane Doe", [])
+
+
+def test_resolve_suggests_close_names(vault):
+    path, suggestions = resolve.resolve_note("T", vault, "Meting Notes")
+    assert path is None
+    assert suggestions[0] == "Meeting Notes"
+
+
+def test_excluded_folders_are_never_resolved_or_mentioned(vault):
+    (vault / "Inbox").mkdir()
+    (vault / "Inbox" / "Lunch.md").write_text("Lunch with Jane Doe")
+    token = resolve.excluded_folders.set(("Inbox",))
+    try:
+        assert resolve.resolve_note("T", vault, "lunch")[0] is None
+        assert resolve.find_notes("T", vault, ["Lunch"]) == {}
+        assert resolve.find_mentions("T", vault, "Lunch with Jane Doe") == [
+            "People/Jane Doe"
+        ]
+    finally:
+        resolve.excluded_folders.reset(token)
+    assert resolve.resolve_note("T", vault, "lunch")[0] == "Inbox/Lunch"